@@ -1,80 +1,649 @@
-import google.generativeai as genai
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import math
+import random
+import re
+import textwrap
+import threading
+import time
+import functools
 import logging
+from collections import Counter
 import streamlit as st
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging once per process; Streamlit re-imports and reruns must not reconfigure it
+if not logging.getLogger().handlers:
+    logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-# Fetch API key securely from Streamlit secrets
-try:
-    api_key = st.secrets["api"]["GEMINI_API_KEY"]
-    genai.configure(api_key=api_key)
-except Exception as e:
-    logging.error("Gemini API key is missing or incorrect. Please check your secrets file.")
+# google.generativeai pulls in protobuf, grpc and auth, so it is imported on first use rather than
+# at module import to keep Streamlit cold starts fast on paths that never call Gemini.
+@st.cache_resource
+def _configure_genai():
+    """Import and configure the Gemini SDK once per process, returning the module."""
+    import google.generativeai as genai
 
-def summarize_document(text):
+    # Fetch API key securely from Streamlit secrets
+    try:
+        api_key = st.secrets["api"]["GEMINI_API_KEY"]
+        # No transport override: the SDK already uses gRPC for its cached sync client and
+        # grpc_asyncio for the async one, and a single transport setting would apply to both
+        genai.configure(api_key=api_key)
+    except Exception as e:
+        logger.exception("Gemini API key is missing or incorrect. Please check your secrets file.")
+
+    return genai
+
+@st.cache_resource
+def _get_model(model_name):
+    """Return the shared Gemini model of the given name, created once and reused across script reruns."""
+    return _configure_genai().GenerativeModel(model_name)
+
+# Risk analysis and chat use the full flash model; bulk summaries default to the smaller, faster
+# flash-8b tier, which operators can override with SUMMARY_MODEL under [api] in the secrets file.
+# The combined summary-and-risks call behind analyze_document runs on ANALYSIS_MODEL, since its
+# risk half needs the full model: one call on the larger model costs less than two separate
+# calls. SUMMARY_MODEL still applies to standalone and batched summaries and to the fallback
+# when the combined reply cannot be used.
+ANALYSIS_MODEL = "gemini-1.5-flash-latest"
+DEFAULT_SUMMARY_MODEL = "gemini-1.5-flash-8b"
+
+def _summary_model():
+    """Return the model name used for summaries."""
+    try:
+        return st.secrets["api"].get("SUMMARY_MODEL", DEFAULT_SUMMARY_MODEL)
+    except Exception:
+        return DEFAULT_SUMMARY_MODEL
+
+@functools.lru_cache(maxsize=1)
+def _retryable_errors():
+    """Return the transient Gemini error types that are retried with jittered exponential backoff."""
+    from google.api_core import exceptions as google_exceptions
+
+    return (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)
+
+# Upper bound on combined document size sent in one batched summarization request
+MAX_BATCH_CHARS = 200000
+
+# Static prompt fragments, joined around the document text at call time
+SUMMARY_PREAMBLE = (
+    "Please provide a concise, well-organized summary of the following document. "
+    "Present the summary as a list of bullet points (no more than 5 bullets) highlighting the key points.\n\n"
+)
+RISKS_PREAMBLE = "Analyze the following legal document and identify potential risks in a clear and organized manner:\n\n"
+ANALYSIS_PREAMBLE = (
+    "Analyze the following legal document. Return only a JSON object with two string fields: "
+    '"summary", a concise, well-organized summary presented as a list of bullet points '
+    "(no more than 5 bullets) highlighting the key points, and "
+    '"risks", the potential risks in the document identified in a clear and organized manner.\n\n'
+)
+CHAT_PREAMBLE = (
+    "You are a futuristic, dynamic, interactive AI legal assistant. "
+    "Your tone is friendly, engaging, and highly informative. Use clear language, "
+    "bullet points when appropriate, and even suggest follow-up questions to the user. \n\n"
+    "Based on the document provided below and the user's query, provide a thoughtful, conversational answer.\n\n"
+    "Document excerpt:\n"
+)
+CHAT_MID = "...\n\nUser Question:\n"
+CHAT_SUFFIX = "\n\nAnswer in a dynamic, engaging style:"
+
+# Output limits per call type; capping max_output_tokens bounds generation time. A single
+# candidate is requested explicitly so no parallel candidates are generated. The combined
+# analysis gets the summary and risk budgets plus headroom for the JSON wrapping, because a
+# truncated reply cannot be parsed and falls back to two more calls.
+SUMMARY_GENERATION_CONFIG = {"max_output_tokens": 400, "temperature": 0.2, "top_p": 0.9, "candidate_count": 1}
+RISKS_GENERATION_CONFIG = {"max_output_tokens": 600, "temperature": 0.2, "top_p": 0.9, "candidate_count": 1}
+ANALYSIS_GENERATION_CONFIG = {"max_output_tokens": 1500, "temperature": 0.2, "top_p": 0.9, "candidate_count": 1}
+CHAT_GENERATION_CONFIG = {"max_output_tokens": 800, "candidate_count": 1}
+
+# Model output ceiling, used to cap the scaled limit for batched summaries
+MAX_OUTPUT_TOKENS = 8192
+
+# Number of document characters given to the chat prompt as context
+CHAT_CONTEXT_CHARS = 3000
+
+# Size of the passages the document is split into for query-aware chat context selection
+CHAT_CHUNK_CHARS = 500
+
+# Input budget for a single prompt; longer documents are summarized chunk by chunk and the
+# partial summaries are then summarized again
+MAX_PROMPT_CHARS = 30000
+CHUNK_CHARS = 20000
+
+# Upper bound on concurrent Gemini calls when summarizing the chunks of one long document
+MAX_CONCURRENT_CHUNKS = 8
+
+# Shared pool for fanning out the synchronous entry points over many documents
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
+# Pool for the chunk and risk calls made within one document on the synchronous path; kept apart
+# from _EXECUTOR so a document being processed there never waits on a slot in its own pool
+_PART_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CHUNKS)
+
+# Caps concurrent Gemini requests sent by _generate to stay within the API rate limit; taken
+# per request, so a long document fanning out into many chunk calls counts each of them
+_API_SLOTS = threading.Semaphore(8)
+
+# Retry policy for the transient errors listed by _retryable_errors
+MAX_ATTEMPTS = 5
+RETRY_MIN_DELAY = 1
+RETRY_MAX_DELAY = 20
+
+# Identical prompts already being sent to Gemini, keyed by prompt hash. Thread-safe futures are
+# used so callers on different threads and event loops can share one request.
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+# Bump when a prompt changes so previously cached answers are not reused
+PROMPT_VERSION = "v2"
+
+def _text_key(text):
+    """Return a compact content hash of the text, tagged with the prompt version, for use as a cache key."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest() + "|" + PROMPT_VERSION
+
+def _backoff_delay(attempt):
+    """Return a randomized delay in seconds before retry number attempt."""
+    return random.uniform(RETRY_MIN_DELAY, min(RETRY_MAX_DELAY, RETRY_MIN_DELAY * 2 ** attempt))
+
+async def _agenerate_with_retry(model_name, prompt, **kwargs):
+    """Call generate_content_async, retrying rate-limit and availability errors."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return await _get_model(model_name).generate_content_async(prompt, **kwargs)
+        except Exception as e:
+            if not isinstance(e, _retryable_errors()) or attempt == MAX_ATTEMPTS:
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning("Gemini call failed (%s), retrying in %.1fs", e, delay)
+            await asyncio.sleep(delay)
+
+def _generate_with_retry(model_name, prompt, **kwargs):
+    """Call generate_content, retrying rate-limit and availability errors."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return _get_model(model_name).generate_content(prompt, **kwargs)
+        except Exception as e:
+            if not isinstance(e, _retryable_errors()) or attempt == MAX_ATTEMPTS:
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning("Gemini call failed (%s), retrying in %.1fs", e, delay)
+            time.sleep(delay)
+
+def _claim_request(model_name, prompt, generation_config):
+    """
+    Return (key, future, is_owner) for the request. The owner sends it and settles the future;
+    other callers wait on the future of the identical request already in flight.
+    """
+    request = model_name + prompt + json.dumps(generation_config, sort_keys=True)
+    key = hashlib.blake2b(request.encode("utf-8"), digest_size=16).hexdigest()
+    with _INFLIGHT_LOCK:
+        future = _INFLIGHT.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = concurrent.futures.Future()
+            _INFLIGHT[key] = future
+    return key, future, is_owner
+
+def _release_request(key):
+    with _INFLIGHT_LOCK:
+        _INFLIGHT.pop(key, None)
+
+def _generate(model_name, prompt, generation_config):
+    """Synchronous counterpart of _agenerate, calling the blocking client on the current thread."""
+    key, future, is_owner = _claim_request(model_name, prompt, generation_config)
+    if not is_owner:
+        return future.result()
+
+    try:
+        with _API_SLOTS:
+            response = _generate_with_retry(model_name, prompt, generation_config=generation_config)
+        future.set_result(response)
+        return response
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _release_request(key)
+
+async def _agenerate(model_name, prompt, generation_config):
+    """Send a prompt to Gemini with retries, sharing the response with concurrent identical requests."""
+    key, future, is_owner = _claim_request(model_name, prompt, generation_config)
+    if not is_owner:
+        return await asyncio.wrap_future(future)
+
+    try:
+        response = await _agenerate_with_retry(model_name, prompt, generation_config=generation_config)
+        future.set_result(response)
+        return response
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _release_request(key)
+
+def _fit(text, max_chars=MAX_PROMPT_CHARS):
+    """Truncate the text to the prompt input budget."""
+    return text if len(text) <= max_chars else text[:max_chars]
+
+def _split_chunks(text):
+    return [text[i:i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)]
+
+async def _asummarize_chunks(text):
+    """Summarize an oversized text chunk by chunk and return the joined partial summaries."""
+    slots = asyncio.Semaphore(MAX_CONCURRENT_CHUNKS)
+
+    async def summarize_chunk(chunk):
+        async with slots:
+            return await _asummarize(chunk)
+
+    partials = await asyncio.gather(*(summarize_chunk(chunk) for chunk in _split_chunks(text)))
+    return "\n".join(partials)
+
+def _summarize_chunks(text):
+    """Synchronous counterpart of _asummarize_chunks, summarizing the chunks on _PART_EXECUTOR."""
+    return "\n".join(_PART_EXECUTOR.map(_summarize, _split_chunks(text)))
+
+def _response_text(response, fallback):
+    """Return the response text, or the fallback when Gemini returned none (e.g. a safety block)."""
+    try:
+        return response.text.strip()
+    except ValueError as e:
+        finish_reason = getattr(response.candidates[0], "finish_reason", None) if response.candidates else None
+        logger.warning("Gemini returned no text: %s; finish_reason=%s", e, finish_reason)
+        return fallback
+
+async def _asummarize(text):
+    """Call Gemini for a summary of the text; raises on API errors."""
+    while len(text) > MAX_PROMPT_CHARS:
+        text = await _asummarize_chunks(text)
+
+    response = await _agenerate(_summary_model(), SUMMARY_PREAMBLE + text, SUMMARY_GENERATION_CONFIG)
+    return _response_text(response, "No summary generated.")
+
+def _summarize(text):
+    """Synchronous counterpart of _asummarize."""
+    while len(text) > MAX_PROMPT_CHARS:
+        text = _summarize_chunks(text)
+
+    response = _generate(_summary_model(), SUMMARY_PREAMBLE + text, SUMMARY_GENERATION_CONFIG)
+    return _response_text(response, "No summary generated.")
+
+async def _aidentify_risks(text):
+    """Call Gemini for a risk analysis of the text; raises on API errors."""
+    response = await _agenerate(ANALYSIS_MODEL, RISKS_PREAMBLE + _fit(text), RISKS_GENERATION_CONFIG)
+    return _response_text(response, "No risks identified.")
+
+def _identify_risks(text):
+    """Synchronous counterpart of _aidentify_risks."""
+    response = _generate(ANALYSIS_MODEL, RISKS_PREAMBLE + _fit(text), RISKS_GENERATION_CONFIG)
+    return _response_text(response, "No risks identified.")
+
+def _parse_json_reply(response):
+    """Parse a JSON reply from Gemini, tolerating a surrounding markdown code fence."""
+    raw = response.text.strip()
+    if raw.startswith("```"):
+        raw = raw.strip("`").removeprefix("json").strip()
+    return json.loads(raw)
+
+def _as_text(value):
+    """Normalize a JSON field that may come back as a string or a list of bullet strings."""
+    if isinstance(value, list):
+        return "\n".join(f"- {item}" for item in value)
+    return str(value).strip()
+
+def _parse_analysis(response):
+    """Return the summary and risks from a combined analysis reply, or None if it cannot be parsed."""
+    try:
+        analysis = _parse_json_reply(response)
+        return {
+            "summary": _as_text(analysis["summary"]) or "No summary generated.",
+            "risks": _as_text(analysis["risks"]) or "No risks identified.",
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning("Combined analysis reply could not be parsed, using separate calls: %s", e)
+        return None
+
+async def _aanalyze(text):
+    """
+    Summarize the text and identify its risks in one Gemini call; raises on API errors.
+    Documents over the prompt budget, or replies that are not valid JSON, fall back to the
+    separate summary and risk calls.
+    """
+    if len(text) <= MAX_PROMPT_CHARS:
+        response = await _agenerate(ANALYSIS_MODEL, ANALYSIS_PREAMBLE + text, ANALYSIS_GENERATION_CONFIG)
+        analysis = _parse_analysis(response)
+        if analysis is not None:
+            return analysis
+
+    summary, risks = await asyncio.gather(_asummarize(text), _aidentify_risks(text))
+    return {"summary": summary, "risks": risks}
+
+def _analyze(text):
+    """Synchronous counterpart of _aanalyze; the fallback risk call runs on _PART_EXECUTOR."""
+    if len(text) <= MAX_PROMPT_CHARS:
+        response = _generate(ANALYSIS_MODEL, ANALYSIS_PREAMBLE + text, ANALYSIS_GENERATION_CONFIG)
+        analysis = _parse_analysis(response)
+        if analysis is not None:
+            return analysis
+
+    risks = _PART_EXECUTOR.submit(_identify_risks, text)
+    summary = _summarize(text)
+    return {"summary": summary, "risks": risks.result()}
+
+def _chat_prompt(context, query):
+    """Build the chat prompt from the document excerpt and the user's question."""
+    return "".join((CHAT_PREAMBLE, context[:CHAT_CONTEXT_CHARS], CHAT_MID, query, CHAT_SUFFIX))
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]{3,}")
+
+# Function words dropped from chat queries so they never decide which passages are picked
+_STOPWORDS = frozenset((
+    "the", "and", "are", "was", "were", "for", "with", "from", "about", "into", "onto", "this",
+    "that", "these", "those", "what", "which", "who", "whom", "whose", "when", "where", "why",
+    "how", "does", "did", "has", "have", "had", "can", "could", "would", "should", "will",
+    "shall", "may", "might", "must", "not", "any", "all", "our", "your", "you", "they", "them",
+    "their", "there", "here", "its", "but", "than", "then", "also", "such", "been", "being",
+    "tell", "please", "explain",
+))
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def build_chat_index(text):
+    """Split the document into passages and index their term counts for select_chat_context."""
+    chunks = textwrap.wrap(text, CHAT_CHUNK_CHARS)
+    chunk_terms = [Counter(_TERM_PATTERN.findall(chunk.lower())) for chunk in chunks]
+    doc_freq = Counter(term for terms in chunk_terms for term in terms)
+    return {"chunks": chunks, "terms": chunk_terms, "doc_freq": doc_freq}
+
+def select_chat_context(index, query, max_chars=CHAT_CONTEXT_CHARS):
+    """
+    Pick the passages most relevant to the query by TF-IDF score, up to max_chars, in document order.
+    Returns None when no passage shares a distinctive (non-stopword, not in every passage) term with the query.
+    """
+    query_terms = set(_TERM_PATTERN.findall(query.lower())) - _STOPWORDS
+    chunks = index["chunks"]
+    if not query_terms or not chunks:
+        return None
+
+    doc_freq = index["doc_freq"]
+    # Terms found in every passage get no weight, so they cannot make every passage relevant
+    idf = {term: math.log(len(chunks) / doc_freq[term]) for term in query_terms if term in doc_freq}
+    if not idf:
+        return None
+
+    scores = [sum(terms[term] * weight for term, weight in idf.items()) for terms in index["terms"]]
+    ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=scores.__getitem__, reverse=True)
+    if not ranked:
+        return None
+
+    selected = []
+    used = 0
+    for i in ranked:
+        if used + len(chunks[i]) > max_chars:
+            break
+        selected.append(i)
+        used += len(chunks[i]) + 1
+    if not selected:
+        return chunks[ranked[0]][:max_chars]
+    return "\n".join(chunks[i] for i in sorted(selected))
+
+# Maximum number of chat answers kept in the shared answer cache
+MAX_CHAT_CACHE_ENTRIES = 256
+
+@st.cache_resource
+def _chat_cache():
+    """
+    Return the process-wide cache of complete chat answers, keyed by (excerpt hash, normalized
+    query). Every session thread shares it, so the lock guards all reads and updates.
+    """
+    return {"answers": {}, "lock": threading.Lock()}
+
+def _chat_key(context, query):
+    # Only the first CHAT_CONTEXT_CHARS characters reach the prompt, so only they take part in the key
+    return _text_key(context[:CHAT_CONTEXT_CHARS]), query.strip().lower()
+
+def _cached_chat_answer(key):
+    cache = _chat_cache()
+    with cache["lock"]:
+        return cache["answers"].get(key)
+
+def _store_chat_answer(key, answer):
+    cache = _chat_cache()
+    with cache["lock"]:
+        answers = cache["answers"]
+        if key not in answers and len(answers) >= MAX_CHAT_CACHE_ENTRIES:
+            # Evict the oldest entry; dicts preserve insertion order
+            answers.pop(next(iter(answers)))
+        answers[key] = answer
+
+async def asummarize_document(text):
     """Summarizes the given text using Google Gemini API in a concise, bullet-point format."""
     if not text:
         return "No text provided for summarization."
-    
+
+    try:
+        return await _asummarize(text)
+    except Exception as e:
+        logger.exception("Summarization error")
+        return f"Error during summarization: {e}"
+
+def _summary_batches(texts):
+    """Group the documents into batches that stay under the model's context window."""
+    batches = []
+    batch = []
+    batch_chars = 0
+    for text in texts:
+        if batch and batch_chars + len(text) > MAX_BATCH_CHARS:
+            batches.append(batch)
+            batch = []
+            batch_chars = 0
+        batch.append(text)
+        batch_chars += len(text)
+    batches.append(batch)
+    return batches
+
+def _batch_request(texts):
+    """Return the prompt and generation config for summarizing a batch of documents in one call."""
     prompt = (
-        "Please provide a concise, well-organized summary of the following document. "
-        "Present the summary as a list of bullet points (no more than 5 bullets) highlighting the key points.\n\n"
-        f"{text}"
+        f"You will be given {len(texts)} documents, each introduced by a line of the form ===DOC i===. "
+        "For each document, provide a concise, well-organized summary as a list of bullet points "
+        "(no more than 5 bullets) highlighting the key points.\n"
+        f"Return only a JSON array of {len(texts)} strings where element i is the bullet-point summary of DOC i.\n\n"
+        + "\n".join(f"===DOC {i}===\n{text}" for i, text in enumerate(texts))
     )
-    
+    generation_config = dict(
+        SUMMARY_GENERATION_CONFIG,
+        max_output_tokens=min(MAX_OUTPUT_TOKENS, SUMMARY_GENERATION_CONFIG["max_output_tokens"] * len(texts)),
+    )
+    return prompt, generation_config
+
+def _parse_batch_reply(response, count):
+    """Return the summaries from a batch reply, or None if it does not hold one per document."""
+    summaries = _parse_json_reply(response)
+    if isinstance(summaries, list) and len(summaries) == count:
+        return [str(summary).strip() for summary in summaries]
+    if isinstance(summaries, list):
+        logger.warning("Batch summary returned %d items for %d documents", len(summaries), count)
+    else:
+        logger.warning("Batch summary returned a JSON %s instead of a list", type(summaries).__name__)
+    return None
+
+async def asummarize_documents(texts):
+    """Summarizes several documents with one Gemini request per batch, returning one summary per text."""
+    if not texts:
+        return []
+
+    summaries = []
+    for batch in _summary_batches(texts):
+        summaries.extend(await _asummarize_batch(batch))
+    return summaries
+
+async def _asummarize_batch(texts):
+    """Summarizes one batch of documents, falling back to per-document calls if the reply can't be parsed."""
+    if len(texts) == 1:
+        return [await asummarize_document(texts[0])]
+
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash-latest")
-        response = model.generate_content(prompt)
-        if response and hasattr(response, "text"):
-            return response.text.strip()
-        else:
-            return "No summary generated."
-    
+        response = await _agenerate(_summary_model(), *_batch_request(texts))
+        summaries = _parse_batch_reply(response, len(texts))
+        if summaries is not None:
+            return summaries
     except Exception as e:
-        logging.error(f"Summarization error: {str(e)}")
-        return f"Error during summarization: {str(e)}"
+        logger.warning("Batch summarization failed, falling back to per-document calls: %s", e)
 
-def identify_risks(text):
+    return list(await asyncio.gather(*(asummarize_document(text) for text in texts)))
+
+async def aidentify_risks(text):
     """Identifies risks in the document using Google Gemini API."""
     if not text:
         return "No text provided."
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash-latest")
-        prompt = f"Analyze the following legal document and identify potential risks in a clear and organized manner:\n\n{text}"
-        response = model.generate_content(prompt)
-        return response.text.strip() if response and hasattr(response, "text") else "No risks identified."
+        return await _aidentify_risks(text)
     except Exception as e:
-        logging.error(f"Risk analysis error: {str(e)}")
-        return f"Error occurred during risk analysis: {str(e)}"
+        logger.exception("Risk analysis error")
+        return f"Error occurred during risk analysis: {e}"
+
+async def achat_with_document(context, query):
+    """Streams an answer about the document excerpt from Google Gemini API, yielding text chunks as they arrive."""
+    if not context or not query:
+        yield "No text or query provided."
+        return
+
+    key = _chat_key(context, query)
+    cached = _cached_chat_answer(key)
+    if cached is not None:
+        yield cached
+        return
+
+    try:
+        parts = []
+        async for chunk in await _agenerate_with_retry(
+            ANALYSIS_MODEL, _chat_prompt(context, query), generation_config=CHAT_GENERATION_CONFIG, stream=True
+        ):
+            parts.append(chunk.text)
+            yield chunk.text
+        answer = "".join(parts).strip()
+        if answer:
+            _store_chat_answer(key, answer)
+        else:
+            yield "No response generated."
+    except Exception as e:
+        logger.exception("Chat error")
+        yield f"Error during chat interaction: {e}"
+
+# Cached entry points keyed on a content hash; the underscore-prefixed text arguments are
+# excluded from Streamlit's own hashing. Errors propagate out of these functions so a
+# failed call is never cached. The pinned google-generativeai release has no server-side
+# context caching (CachedContent), so the document is instead sent at most once per content
+# hash: summary and risks share this one call, and chat only sends the selected passages.
+# Analyses of uploaded documents are kept in memory only, never on disk, and expire after
+# ANALYSIS_CACHE_TTL so they are not retained beyond what the privacy policy states.
+ANALYSIS_CACHE_TTL = 24 * 60 * 60
+
+@st.cache_data(show_spinner=False, max_entries=256, ttl=ANALYSIS_CACHE_TTL)
+def _cached_analysis(text_key, summary_model, _text):
+    return _analyze(_text)
+
+# Synchronous entry points for the Streamlit script. They call the blocking client directly and
+# fan out on thread pools; they never start an event loop, because the SDK's cached async client
+# stays bound to the first loop it runs on. The async variants above are for async callers only.
+def analyze_document(text):
+    """
+    Summarize the document and identify its risks with one cached Gemini call.
+    Returns a dict with "summary" and "risks" text; on failure both hold the error message.
+    """
+    if not text:
+        return {"summary": "No text provided for summarization.", "risks": "No text provided."}
+
+    try:
+        return _cached_analysis(_text_key(text), _summary_model(), text)
+    except Exception as e:
+        logger.exception("Document analysis error")
+        return {
+            "summary": f"Error during summarization: {e}",
+            "risks": f"Error occurred during risk analysis: {e}",
+        }
+
+def summarize_document(text):
+    """Synchronous counterpart of asummarize_document, served from the combined analyze_document call."""
+    return analyze_document(text)["summary"]
+
+def _summary_text(text):
+    """Synchronous counterpart of asummarize_document, used when a batched summary falls back to per-document calls."""
+    if not text:
+        return "No text provided for summarization."
+
+    try:
+        return _summarize(text)
+    except Exception as e:
+        logger.exception("Summarization error")
+        return f"Error during summarization: {e}"
+
+def _summarize_batch(texts):
+    """Synchronous counterpart of _asummarize_batch; the per-document fallback runs on _EXECUTOR."""
+    if len(texts) == 1:
+        return [_summary_text(texts[0])]
+
+    try:
+        summaries = _parse_batch_reply(_generate(_summary_model(), *_batch_request(texts)), len(texts))
+        if summaries is not None:
+            return summaries
+    except Exception as e:
+        logger.warning("Batch summarization failed, falling back to per-document calls: %s", e)
+
+    return list(_EXECUTOR.map(_summary_text, texts))
+
+def summarize_documents(texts):
+    """Synchronous counterpart of asummarize_documents."""
+    if not texts:
+        return []
+
+    summaries = []
+    for batch in _summary_batches(texts):
+        summaries.extend(_summarize_batch(batch))
+    return summaries
+
+def summarize_many(texts):
+    """Summarizes each text concurrently on the shared thread pool, preserving input order."""
+    return list(_EXECUTOR.map(summarize_document, texts))
+
+def identify_risks(text):
+    """Synchronous counterpart of aidentify_risks, served from the combined analyze_document call."""
+    return analyze_document(text)["risks"]
+
+def identify_risks_many(texts):
+    """Runs risk analysis for each text concurrently on the shared thread pool, preserving input order."""
+    return list(_EXECUTOR.map(identify_risks, texts))
+
+def chat_with_document(context, query):
+    """Streams an answer about the document excerpt, yielding text chunks for st.write_stream.
+
+    The caller passes a short excerpt (see CHAT_CONTEXT_CHARS) rather than the full document text.
+    """
+    if not context or not query:
+        yield "No text or query provided."
+        return
 
-def chat_with_document(text, query):
-    """Allows users to chat with the document using Google Gemini API with a futuristic, interactive style."""
-    if not text or not query:
-        return "No text or query provided."
+    key = _chat_key(context, query)
+    cached = _cached_chat_answer(key)
+    if cached is not None:
+        yield cached
+        return
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash-latest")
-        prompt = (
-            "You are a futuristic, dynamic, interactive AI legal assistant. "
-            "Your tone is friendly, engaging, and highly informative. Use clear language, "
-            "bullet points when appropriate, and even suggest follow-up questions to the user. \n\n"
-            "Based on the document provided below and the user's query, provide a thoughtful, conversational answer.\n\n"
-            "Document (first 3000 characters):\n"
-            f"{text[:3000]}...\n\n"
-            "User Question:\n"
-            f"{query}\n\n"
-            "Answer in a dynamic, engaging style:"
-        )
-        
-        response = model.generate_content(prompt)
-        
-        if response and hasattr(response, "text"):
-            return response.text.strip()
+        parts = []
+        for chunk in _generate_with_retry(
+            ANALYSIS_MODEL, _chat_prompt(context, query), generation_config=CHAT_GENERATION_CONFIG, stream=True
+        ):
+            parts.append(chunk.text)
+            yield chunk.text
+        answer = "".join(parts).strip()
+        if answer:
+            _store_chat_answer(key, answer)
         else:
-            return "No response generated."
-    
+            yield "No response generated."
     except Exception as e:
-        logging.error(f"Chat error: {str(e)}")
-        return f"Error during chat interaction: {str(e)}"
+        logger.exception("Chat error")
+        yield f"Error during chat interaction: {e}"
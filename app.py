@@ -23,27 +23,17 @@ Created for Legal professionals and businesses to streamline document analysis.
 
 import streamlit as st
 import logging
-import smtplib
+import codecs
 import io
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import re
+from collections import Counter
 from pdf_processor import extract_text_from_pdf
-from ai_analyzer import identify_risks, summarize_document, chat_with_document
-from utils import initialize_session_state
-from fpdf import FPDF
-from docx import Document
+from ai_analyzer import identify_risks, summarize_document, chat_with_document, build_chat_index, select_chat_context, CHAT_CONTEXT_CHARS
+from utils import initialize_session_state, email_configured
 from datetime import datetime
 # Import GDPR compliance features
-from gdpr_compliance import show_gdpr_consent_banner, add_privacy_policy_footer, show_gdpr_info_iframe, show_privacy_policy
-
-# Import email functionality - add this at the top with other imports
-try:
-    from email_service import email_ui_section
-    email_enabled = True
-except ImportError:
-    email_enabled = False
-    logging.warning("Email service module not found. Email functionality disabled.")
+from gdpr_compliance import show_gdpr_consent_banner, add_privacy_policy_footer, show_gdpr_info_iframe, show_privacy_policy, restore_gdpr_consent
 
 st.set_page_config(
     page_title="AI Legal Document Assistant",
@@ -56,11 +46,7 @@ logging.basicConfig(level=logging.INFO)
 
 # Initialize session state variables
 initialize_session_state()
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
-
-# Set current year for privacy policy footer
-st.session_state['current_year'] = datetime.now().year
+restore_gdpr_consent()
 
 # Check if we should show the privacy policy
 if st.session_state.get('show_privacy_policy', False):
@@ -70,75 +56,169 @@ if st.session_state.get('show_privacy_policy', False):
 # Show GDPR consent banner if consent not given
 show_gdpr_consent_banner()
 
+def stamp_report():
+    """
+    Record when the current analysis was produced. Exports print this time, and it is part of
+    the export cache keys, so it only changes when the summary or risks do.
+    """
+    st.session_state['report_timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M')
+
+# Block size used when decoding uploaded text files
+TXT_READ_BLOCK_SIZE = 64 * 1024
+
 def extract_text_from_uploaded_file(uploaded_file):
     ext = os.path.splitext(uploaded_file.name)[1].lower()
     if ext == ".pdf":
         return extract_text_from_pdf(uploaded_file)
     elif ext in [".doc", ".docx"]:
         try:
+            # python-docx is only needed for Word uploads, so import it on first use
+            from docx import Document
             document = Document(uploaded_file)
-            fullText = [para.text for para in document.paragraphs]
-            return "\n".join(fullText)
+            # Join straight from a generator so no intermediate list of paragraph strings is built
+            return "\n".join(para.text for para in document.paragraphs if para.text)
         except Exception as e:
             logging.error(f"Error reading DOC/DOCX: {str(e)}")
             return None
     elif ext == ".txt":
         try:
-            return uploaded_file.getvalue().decode("utf-8")
+            # Decode in fixed-size blocks from the upload's own buffer rather than copying it with getvalue()
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            uploaded_file.seek(0)
+            chunks = []
+            while True:
+                block = uploaded_file.read(TXT_READ_BLOCK_SIZE)
+                if not block:
+                    chunks.append(decoder.decode(b"", final=True))
+                    break
+                chunks.append(decoder.decode(block))
+            return "".join(chunks)
         except Exception as e:
             logging.error(f"Error reading TXT: {str(e)}")
             return None
     else:
         return None
 
-def generate_txt(content):
+# Divider lines used in the generated exports
+EXPORT_HEADER_RULE = "=" * 50
+REPORT_RULE = "=" * 80
+SECTION_RULE = "-" * 80
+DOCX_HEADER_RULE = "_" * 60
+
+# Section headers recognised in export content, mapped to the headings used in DOCX/PDF reports
+SECTION_HEADINGS = {
+    "DOCUMENT SUMMARY": "Document Summary",
+    "RISK SCORE": "Risk Assessment Score",
+    "RISK ANALYSIS": "Detailed Risk Analysis",
+}
+_SECTION_RE = re.compile(r"^[ \t]*(DOCUMENT SUMMARY|RISK SCORE|RISK ANALYSIS)[^\n]*$", re.MULTILINE)
+# Rules placed directly under a section header; only that line is dropped from the section,
+# so Markdown rules and table borders inside the summary or risk text are kept
+_HEADER_RULES = frozenset((EXPORT_HEADER_RULE, REPORT_RULE, SECTION_RULE))
+
+# Priority sub-headers in structured risk analyses, with the PDF heading and colour for each.
+# Matched anywhere in a line, so Markdown-decorated headers like "## HIGH PRIORITY RISKS" or
+# "**HIGH PRIORITY RISKS:**" are recognised too.
+_PRIORITY_HEADER_RE = re.compile(r"(HIGH|MEDIUM|LOW) PRIORITY RISKS")
+PRIORITY_STYLES = {
+    "HIGH": ("High Priority Risks", (255, 0, 0)),  # Red
+    "MEDIUM": ("Medium Priority Risks", (255, 165, 0)),  # Orange
+    "LOW": ("Low Priority Risks", (0, 128, 0)),  # Green
+}
+
+def _section_lines(text, under_header=True):
+    """Split a section body into lines, dropping the rule under its header and surrounding blank lines."""
+    body = text.strip()
+    if under_header:
+        first, _, rest = body.partition("\n")
+        if first.strip() in _HEADER_RULES:
+            body = rest.strip()
+    return body.split("\n") if body else []
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def parse_report(content):
+    """
+    Split export content into (marker, title, lines) sections in a single pass.
+    marker is the recognised header keyword, or None for any text before the first header.
+    """
+    sections = []
+    matches = list(_SECTION_RE.finditer(content))
+    
+    preamble = content[:matches[0].start()] if matches else content
+    if preamble.strip():
+        sections.append((None, "", _section_lines(preamble, under_header=False)))
+    
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        sections.append((match.group(1), match.group(0).strip(), _section_lines(content[match.end():end])))
+    
+    return sections
+
+def build_export_content(summary, risks, selected_content):
+    """
+    Assemble the export text from the selected sections.
+    The last result is kept in session state and reused while its inputs are unchanged,
+    so reruns triggered by unrelated widgets do not rebuild it.
+    """
+    # The fingerprint holds the analysis strings themselves, so matching them is an identity check
+    fingerprint = (summary, risks, tuple(selected_content))
+    previous = st.session_state.get("export_content")
+    if previous is not None and previous[0] == fingerprint:
+        return previous[1]
+    
+    parts = []
+    if "Summary" in selected_content and summary:
+        parts.append(f"DOCUMENT SUMMARY\n{EXPORT_HEADER_RULE}\n{summary}\n\n")
+    if "Risk Analysis" in selected_content and risks:
+        parts.append(f"RISK ANALYSIS\n{EXPORT_HEADER_RULE}\n{risks}\n\n")
+    
+    export_content = "".join(parts)
+    st.session_state.export_content = (fingerprint, export_content)
+    return export_content
+
+# Seconds a generated export is kept for repeated downloads and format switches
+EXPORT_CACHE_TTL = 24 * 60 * 60
+
+@st.cache_data(ttl=EXPORT_CACHE_TTL, max_entries=16, show_spinner=False)
+def generate_txt(content, generated_on):
     """Generate a well-formatted text document for download"""
-    # Format the content with clear section dividers
-    lines = content.split("\n")
     formatted_lines = []
     
     # Add a header
-    formatted_lines.append("=" * 80)
+    formatted_lines.append(REPORT_RULE)
     formatted_lines.append("LEGAL DOCUMENT ANALYSIS REPORT")
-    formatted_lines.append(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    formatted_lines.append("=" * 80)
+    formatted_lines.append(f"Generated on: {generated_on}")
+    formatted_lines.append(REPORT_RULE)
     formatted_lines.append("")
     
     # Process content with proper spacing
     in_section = False
-    section_title = ""
     
-    for line in lines:
-        # Check for section headers
-        if "DOCUMENT SUMMARY" in line or "RISK ANALYSIS" in line or "RISK SCORE" in line:
+    for marker, section_title, lines in parse_report(content):
+        if marker:
             # Add spacing between sections
             if in_section:
                 formatted_lines.append("")
             
             in_section = True
-            section_title = line.strip()
             
             # Add section header with emphasis
             formatted_lines.append("")
             formatted_lines.append(section_title)
             formatted_lines.append("-" * len(section_title))
-            
-        elif line.strip() == "=" * 50:
-            # Skip the original separator lines
-            continue
-        else:
-            # Regular content - ensure proper line spacing
-            if line.strip():
-                formatted_lines.append(line)
+        
+        # Regular content - ensure proper line spacing
+        formatted_lines.extend(line for line in lines if line.strip())
     
     # Add footer
     formatted_lines.append("")
-    formatted_lines.append("-" * 80)
+    formatted_lines.append(SECTION_RULE)
     formatted_lines.append("End of Report")
     
     return "\n".join(formatted_lines)
 
-def generate_docx(content):
+@st.cache_data(ttl=EXPORT_CACHE_TTL, max_entries=16, show_spinner=False)
+def generate_docx(content, generated_on):
     """Generate a professionally formatted Word document for download"""
     from docx import Document
     from docx.shared import Pt, Inches, RGBColor
@@ -157,58 +237,42 @@ def generate_docx(content):
     # Add date
     date_paragraph = doc.add_paragraph()
     date_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    date_run = date_paragraph.add_run(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    date_run = date_paragraph.add_run(f"Generated on: {generated_on}")
     date_run.italic = True
     
     # Add horizontal line
-    doc.add_paragraph("_" * 60)
+    doc.add_paragraph(DOCX_HEADER_RULE)
     
     # Process content by sections
-    lines = content.split("\n")
-    current_section = None
-    
-    for line in lines:
-        if "DOCUMENT SUMMARY" in line:
-            # Add Summary section with formatting
-            doc.add_paragraph()  # Add some spacing
-            heading = doc.add_heading("Document Summary", level=2)
-            current_section = "summary"
-            
-        elif "RISK SCORE" in line:
-            # Add Risk Score section with formatting
-            doc.add_paragraph()  # Add some spacing
-            heading = doc.add_heading("Risk Assessment Score", level=2)
-            current_section = "risk_score"
-            
-        elif "RISK ANALYSIS" in line:
-            # Add Risk Analysis section with formatting
+    for marker, _, lines in parse_report(content):
+        if marker:
+            # Add the section heading with formatting
             doc.add_paragraph()  # Add some spacing
-            heading = doc.add_heading("Detailed Risk Analysis", level=2)
-            current_section = "risk_analysis"
+            doc.add_heading(SECTION_HEADINGS[marker], level=2)
+        
+        for line in lines:
+            if not line.strip():
+                continue
             
-        elif line.strip() and not line.startswith("=") and not line.startswith("-"):
             # Regular content - check for potential risk items
             p = doc.add_paragraph()
             
             # Check if this might be a risk item with priority
-            if current_section == "risk_analysis":
-                if line.lower().startswith(("high", "medium", "low")) and ":" in line:
-                    # This is a risk item with priority
-                    priority, description = line.split(":", 1)
-                    priority = priority.strip()
-                    
-                    # Format based on priority
-                    priority_run = p.add_run(f"{priority}: ")
-                    priority_run.bold = True
-                    
-                    if "high" in priority.lower():
-                        priority_run.font.color.rgb = RGBColor(255, 0, 0)  # Red for high
-                    elif "medium" in priority.lower():
-                        priority_run.font.color.rgb = RGBColor(255, 165, 0)  # Orange for medium
-                    
-                    p.add_run(description.strip())
-                else:
-                    p.add_run(line)
+            if marker == "RISK ANALYSIS" and line.lower().startswith(("high", "medium", "low")) and ":" in line:
+                # This is a risk item with priority
+                priority, description = line.split(":", 1)
+                priority = priority.strip()
+                
+                # Format based on priority
+                priority_run = p.add_run(f"{priority}: ")
+                priority_run.bold = True
+                
+                if "high" in priority.lower():
+                    priority_run.font.color.rgb = RGBColor(255, 0, 0)  # Red for high
+                elif "medium" in priority.lower():
+                    priority_run.font.color.rgb = RGBColor(255, 165, 0)  # Orange for medium
+                
+                p.add_run(description.strip())
             else:
                 p.add_run(line)
     
@@ -217,18 +281,17 @@ def generate_docx(content):
     footer = doc.add_paragraph("End of Report")
     footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
     
-    # Save the document to a BytesIO object
+    # Save the document and return its bytes
     buf = io.BytesIO()
     doc.save(buf)
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
 
-def generate_pdf(content):
+@st.cache_data(ttl=EXPORT_CACHE_TTL, max_entries=16, show_spinner=False)
+def generate_pdf(content, generated_on):
     """Generate a professionally formatted PDF for download"""
-    from fpdf import FPDF
-    from datetime import datetime
+    from pdf_writer import FastPDF
     
-    class PDF(FPDF):
+    class PDF(FastPDF):
         def header(self):
             # Add logo (placeholder)
             # self.image('logo.png', 10, 8, 33)
@@ -241,7 +304,7 @@ def generate_pdf(content):
             
             # Date
             self.set_font('Arial', 'I', 10)
-            self.cell(0, 5, f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')}", 0, 1, 'C')
+            self.cell(0, 5, f"Generated on {generated_on}", 0, 1, 'C')
             
             # Line break
             self.ln(5)
@@ -268,132 +331,120 @@ def generate_pdf(content):
     pdf.set_auto_page_break(auto=True, margin=15)
     
     # Process content by sections
-    content_parts = content.split("\n\n")
-    current_section = None
-    
-    for part in content_parts:
-        if "DOCUMENT SUMMARY" in part:
-            # Summary section
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Document Summary", 0, 1, "L")
+    for marker, _, lines in parse_report(content):
+        section_content = "\n".join(lines).strip()
+        
+        if marker is None:
+            # Other content
             pdf.set_font("Arial", "", 11)
-            
-            # Get content after header
-            summary_content = part.split("-" * 30)[1].strip() if "-" * 30 in part else part.replace("DOCUMENT SUMMARY", "").strip()
-            
+            pdf.multi_cell(0, 7, section_content)
+            pdf.ln(3)
+            continue
+        
+        # Section heading
+        pdf.set_font("Arial", "B", 14)
+        pdf.cell(0, 10, SECTION_HEADINGS[marker], 0, 1, "L")
+        pdf.set_font("Arial", "", 11)
+        
+        if marker == "DOCUMENT SUMMARY":
             # Add the summary text
-            pdf.multi_cell(0, 7, summary_content)
-            pdf.ln(5)
-            
-        elif "RISK SCORE" in part:
-            # Risk score section
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Risk Assessment Score", 0, 1, "L")
-            pdf.set_font("Arial", "", 11)
-            
-            # Get content after header
-            score_content = part.split("-" * 30)[1].strip() if "-" * 30 in part else part.replace("RISK SCORE", "").strip()
+            pdf.multi_cell(0, 7, section_content)
             
+        elif marker == "RISK SCORE":
             # Parse score lines
-            for line in score_content.split("\n"):
+            for line in lines:
                 if "Score:" in line or "Risk Level:" in line:
                     pdf.set_font("Arial", "B", 11)
                     pdf.cell(0, 7, line, 0, 1)
                     pdf.set_font("Arial", "", 11)
                 else:
                     pdf.cell(0, 7, line, 0, 1)
-                    
-            pdf.ln(5)
-            
-        elif "RISK ANALYSIS" in part:
-            # Risk analysis section
-            pdf.set_font("Arial", "B", 14)
-            pdf.cell(0, 10, "Detailed Risk Analysis", 0, 1, "L")
-            pdf.set_font("Arial", "", 11)
-            
-            # Get content after header
-            analysis_content = part.split("-" * 30)[1].strip() if "-" * 30 in part else part.replace("RISK ANALYSIS", "").strip()
             
-            # Check for priority sections
-            if "HIGH PRIORITY RISKS" in analysis_content:
-                # Handle structured risk content
-                sections = analysis_content.split("\n\n")
-                for section in sections:
-                    if "HIGH PRIORITY RISKS" in section:
-                        pdf.set_font("Arial", "B", 12)
-                        pdf.set_text_color(255, 0, 0)  # Red
-                        pdf.cell(0, 10, "High Priority Risks", 0, 1)
-                        pdf.set_text_color(0, 0, 0)  # Black
-                        pdf.set_font("Arial", "", 11)
-                        
-                        # Add each risk
-                        for line in section.split("\n"):
-                            if not line.strip() or "HIGH PRIORITY RISKS" in line:
-                                continue
-                            pdf.multi_cell(0, 7, line)
-                            
-                    elif "MEDIUM PRIORITY RISKS" in section:
-                        pdf.set_font("Arial", "B", 12)
-                        pdf.set_text_color(255, 165, 0)  # Orange
-                        pdf.cell(0, 10, "Medium Priority Risks", 0, 1)
-                        pdf.set_text_color(0, 0, 0)  # Black
-                        pdf.set_font("Arial", "", 11)
-                        
-                        # Add each risk
-                        for line in section.split("\n"):
-                            if not line.strip() or "MEDIUM PRIORITY RISKS" in line:
-                                continue
-                            pdf.multi_cell(0, 7, line)
-                            
-                    elif "LOW PRIORITY RISKS" in section:
-                        pdf.set_font("Arial", "B", 12)
-                        pdf.set_text_color(0, 128, 0)  # Green
-                        pdf.cell(0, 10, "Low Priority Risks", 0, 1)
-                        pdf.set_text_color(0, 0, 0)  # Black
-                        pdf.set_font("Arial", "", 11)
-                        
-                        # Add each risk
-                        for line in section.split("\n"):
-                            if not line.strip() or "LOW PRIORITY RISKS" in line:
-                                continue
-                            pdf.multi_cell(0, 7, line)
-            else:
-                # Unstructured content
-                pdf.multi_cell(0, 7, analysis_content)
+        elif _PRIORITY_HEADER_RE.search(section_content):
+            # Structured risk content: group the lines under their priority headers in one pass
+            blocks = []
+            for line in lines:
+                header = _PRIORITY_HEADER_RE.search(line)
+                if header:
+                    blocks.append((header.group(1), []))
+                elif line.strip() and blocks:
+                    blocks[-1][1].append(line)
+            
+            for priority, risk_lines in blocks:
+                title, color = PRIORITY_STYLES[priority]
+                pdf.set_font("Arial", "B", 12)
+                pdf.set_text_color(*color)
+                pdf.cell(0, 10, title, 0, 1)
+                pdf.set_text_color(0, 0, 0)  # Black
+                pdf.set_font("Arial", "", 11)
                 
-            pdf.ln(5)
-            
+                # Add the risks in one layout pass
+                if risk_lines:
+                    pdf.multi_cell(0, 7, "\n".join(risk_lines))
         else:
-            # Other content
-            pdf.set_font("Arial", "", 11)
-            pdf.multi_cell(0, 7, part)
-            pdf.ln(3)
-    
-    # Get the PDF as bytes
-    pdf_str = pdf.output(dest="S")
-    if isinstance(pdf_str, str):
-        pdf_bytes = pdf_str.encode("latin1")
-    else:
-        pdf_bytes = pdf_str
-        
-    buf = io.BytesIO(pdf_bytes)
-    buf.seek(0)
-    return buf
+            # Unstructured risk analysis
+            pdf.multi_cell(0, 7, section_content)
+            
+        pdf.ln(5)
+    
+    # FastPDF.output returns the finished document as bytes
+    return pdf.output()
+
+# Export formats offered in the sidebar: generator, download file name and MIME type
+EXPORT_FORMATS = {
+    "PDF": (generate_pdf, "legal_analysis.pdf", "application/pdf"),
+    "DOCX": (generate_docx, "legal_analysis.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "TXT": (generate_txt, "legal_analysis.txt", "text/plain"),
+}
+
+# Keywords counted by calculate_risk_score for each priority level
+HIGH_SCORE_KEYWORDS = ('critical', 'severe', 'high')
+MEDIUM_SCORE_KEYWORDS = ('moderate', 'medium')
+
+# Key risk indicators reported by display_risk_visualizer, as (term, related term) pairs
+RISK_INDICATOR_PAIRS = (
+    ("non-compliance", "regulatory requirements"),
+    ("liability", "legal exposure"),
+    ("breach", "contract terms"),
+    ("confidentiality", "disclosure"),
+    ("warranty", "guarantees"),
+    ("termination", "cancellation"),
+    ("intellectual property", "IP rights"),
+    ("dispute", "resolution"),
+    ("payment", "financial terms")
+)
+
+# One alternation over every scored keyword and indicator term, so a single scan of the
+# lowercased text counts them all. Longer terms come first so they win at a shared position.
+_RISK_TERMS = set(HIGH_SCORE_KEYWORDS + MEDIUM_SCORE_KEYWORDS) | {
+    term.lower() for pair in RISK_INDICATOR_PAIRS for term in pair
+}
+_RISK_TERM_RE = re.compile("|".join(re.escape(term) for term in sorted(_RISK_TERMS, key=len, reverse=True)))
+
+def count_risk_terms(text_lower):
+    """Count occurrences of each risk keyword and indicator term in lowercased text in one pass"""
+    return Counter(_RISK_TERM_RE.findall(text_lower))
 
+# Number of leading characters of the risk analysis used for scoring
+MAX_SCORE_TEXT_LENGTH = 10000
+
+@st.cache_data(max_entries=32, show_spinner=False)
 def calculate_risk_score(risks_text):
     """Calculate a simplified risk score to avoid connection errors"""
     if not risks_text or not isinstance(risks_text, str):
         return 0, 0, 0, 0
     
     # Use simple keyword counting - limit processing to avoid timeouts
-    text_lower = risks_text.lower()
-    max_text_length = min(len(text_lower), 10000)  # Cap text length for processing
-    text_sample = text_lower[:max_text_length]
+    # Cap text length for processing; only the capped sample is lowercased
+    if len(risks_text) > MAX_SCORE_TEXT_LENGTH:
+        risks_text = risks_text[:MAX_SCORE_TEXT_LENGTH]
+    text_sample = risks_text.lower()
     
     # Count simple keyword occurrences
-    high_count = sum(text_sample.count(word) for word in ['critical', 'severe', 'high'])
-    medium_count = sum(text_sample.count(word) for word in ['moderate', 'medium'])
-    low_count = len(text_sample.split('.')) - high_count - medium_count
+    term_counts = count_risk_terms(text_sample)
+    high_count = sum(term_counts[word] for word in HIGH_SCORE_KEYWORDS)
+    medium_count = sum(term_counts[word] for word in MEDIUM_SCORE_KEYWORDS)
+    low_count = text_sample.count('.') + 1 - high_count - medium_count
     low_count = max(0, low_count)
     
     total = high_count + medium_count + low_count
@@ -438,21 +489,49 @@ def display_risk_score(risks_text):
         st.error(f"Error calculating risk score: {str(e)}")
         st.info("Please try again with a different document.")
 
+# Keywords that place a risk sentence in the high or medium priority group
+HIGH_RISK_KEYWORDS = ('critical', 'severe', 'high risk', 'significant', 'major', 'serious')
+MEDIUM_RISK_KEYWORDS = ('moderate', 'medium', 'potential', 'possible', 'concerning')
+_HIGH_RISK_RE = re.compile("|".join(map(re.escape, HIGH_RISK_KEYWORDS)), re.IGNORECASE)
+_MEDIUM_RISK_RE = re.compile("|".join(map(re.escape, MEDIUM_RISK_KEYWORDS)), re.IGNORECASE)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def classify_risks(risks_text):
+    """Split risk text into sentences and group them by priority.
+    Returns (sentence_count, high_risks, medium_risks, low_risks)."""
+    # Split the text into sentences
+    sentences = [s.strip() for s in risks_text.split('.') if s.strip()]
+    
+    # Categorize sentences by risk level
+    high_risks = []
+    medium_risks = []
+    low_risks = []
+    
+    for sentence in sentences:
+        if _HIGH_RISK_RE.search(sentence):
+            high_risks.append(sentence)
+        elif _MEDIUM_RISK_RE.search(sentence):
+            medium_risks.append(sentence)
+        elif len(sentence.split()) > 5:  # Only include as low risk if it's a substantial sentence
+            low_risks.append(sentence)
+    
+    return len(sentences), high_risks, medium_risks, low_risks
+
 def display_risks_with_filters(risks_text):
     """Display risks with filtering options from text"""
     if not risks_text or not isinstance(risks_text, str):
         st.warning("No risks identified.")
         return
     
-    # Split the text into sentences
-    sentences = [s.strip() for s in risks_text.split('.') if s.strip()]
+    # Classification doesn't depend on the filter, so toggling it reuses the cached result
+    sentence_count, high_risks, medium_risks, low_risks = classify_risks(risks_text)
     
-    if not sentences:
+    if not sentence_count:
         st.warning("No clear risk statements identified.")
         return
         
     # Count risks
-    st.write(f"Total Potential Risks Found: {len(sentences)}")
+    st.write(f"Total Potential Risks Found: {sentence_count}")
     
     # Add filter options
     priority_filter = st.multiselect(
@@ -461,23 +540,6 @@ def display_risks_with_filters(risks_text):
         default=["High", "Medium", "Low"]
     )
     
-    # Categorize sentences by risk level
-    high_risk_keywords = ['critical', 'severe', 'high risk', 'significant', 'major', 'serious']
-    medium_risk_keywords = ['moderate', 'medium', 'potential', 'possible', 'concerning']
-    
-    high_risks = []
-    medium_risks = []
-    low_risks = []
-    
-    for sentence in sentences:
-        sentence_lower = sentence.lower()
-        if any(keyword in sentence_lower for keyword in high_risk_keywords):
-            high_risks.append(sentence)
-        elif any(keyword in sentence_lower for keyword in medium_risk_keywords):
-            medium_risks.append(sentence)
-        elif len(sentence.split()) > 5:  # Only include as low risk if it's a substantial sentence
-            low_risks.append(sentence)
-    
     # Display filtered risks
     if "High" in priority_filter and high_risks:
         st.markdown("#### 🔴 High Priority Risks")
@@ -596,23 +658,12 @@ def display_risk_visualizer(risks_text):
             # Top risk areas (simplified)
             st.subheader("Key Risk Indicators")
             
-            # Find most common risk keywords
-            risk_keywords = [
-                ("non-compliance", "regulatory requirements"),
-                ("liability", "legal exposure"),
-                ("breach", "contract terms"),
-                ("confidentiality", "disclosure"),
-                ("warranty", "guarantees"),
-                ("termination", "cancellation"),
-                ("intellectual property", "IP rights"),
-                ("dispute", "resolution"),
-                ("payment", "financial terms")
-            ]
+            # Count every risk indicator term in a single pass over the text
+            term_counts = count_risk_terms(risks_text.lower())
             
-            # Count keyword occurrences
             keyword_counts = []
-            for kw_pair in risk_keywords:
-                count = sum(risks_text.lower().count(kw) for kw in kw_pair)
+            for kw_pair in RISK_INDICATOR_PAIRS:
+                count = sum(term_counts[kw.lower()] for kw in kw_pair)
                 if count > 0:
                     keyword_counts.append((f"{kw_pair[0]}/{kw_pair[1]}", count))
             
@@ -648,6 +699,8 @@ with tab1:
                     st.error("No text extracted. The document may be scanned, encrypted, or in an unsupported format.")
                     st.stop()
                 st.session_state.extracted_text = extracted_text
+                # Opening excerpt used as chat context when no passage matches the question
+                st.session_state.doc_excerpt = extracted_text[:CHAT_CONTEXT_CHARS]
                 logging.info(f"Extracted {len(extracted_text)} characters.")
                 st.success("Document processed successfully! Navigate to other tabs for analysis.")
         except Exception as e:
@@ -661,6 +714,7 @@ with tab2:
             with st.spinner("Analyzing document..."):
                 summary = summarize_document(st.session_state.extracted_text)
                 st.session_state.summary = summary if summary else "No summary generated."
+                stamp_report()
         
         if st.session_state.get("summary"):
             st.markdown("### 📝 Document Summary")
@@ -680,6 +734,10 @@ with tab3:
                     with st.spinner("Analyzing document for potential risks..."):
                         risks = identify_risks(st.session_state.extracted_text)
                         st.session_state.risks = risks
+                        st.session_state.risks_snippet = risks[:500] + "..."
+                        # Score once now; the score, visualizer and summary views then hit the cache
+                        calculate_risk_score(risks)
+                        stamp_report()
                         st.success("✅ Analysis complete")
                 except Exception as e:
                     st.error(f"Error during analysis: {str(e)}")
@@ -710,7 +768,8 @@ with tab3:
                     try:
                         # Use a more basic version of the summary to avoid errors
                         st.subheader("Risk Summary")
-                        st.write(st.session_state.risks[:500] + "...")
+                        st.text_area("Risk Summary", value=st.session_state.risks_snippet, key="risk_snippet",
+                                     disabled=True, label_visibility="collapsed")
                         st.info("View the Detailed Analysis tab for complete information")
                     except Exception as e:
                         st.error(f"Error displaying summary: {str(e)}")
@@ -725,20 +784,8 @@ with tab3:
             
             with risk_tab1:
                 try:
-                    # Use a simplified version of display_risks_with_filters
-                    if st.session_state.risks:
-                        st.write("Risk Analysis Results:")
-                        text = st.session_state.risks
-                        
-                        # Simple display of first few risks
-                        sentences = [s.strip() for s in text.split('.') if len(s.strip()) > 10][:15]
-                        for i, sentence in enumerate(sentences, 1):
-                            if 'critical' in sentence.lower() or 'severe' in sentence.lower() or 'high' in sentence.lower():
-                                st.error(f"{i}. {sentence}")
-                            elif 'moderate' in sentence.lower() or 'medium' in sentence.lower():
-                                st.warning(f"{i}. {sentence}")
-                            else:
-                                st.info(f"{i}. {sentence}")
+                    # Sentences are classified once per risk text; the priority filter only re-renders
+                    display_risks_with_filters(st.session_state.risks)
                 except Exception as e:
                     st.error(f"Error displaying detailed analysis: {str(e)}")
                     st.info("Try viewing the Full Risk Text tab instead.")
@@ -746,7 +793,8 @@ with tab3:
             with risk_tab2:
                 try:
                     st.markdown("### Complete Risk Analysis")
-                    st.write(st.session_state.risks)
+                    st.text_area("Complete Risk Analysis", value=st.session_state.risks, height=600,
+                                 key="full_risks", disabled=True, label_visibility="collapsed")
                 except Exception as e:
                     st.error(f"Error displaying full text: {str(e)}")
     else:
@@ -764,10 +812,14 @@ with tab4:
         user_message = st.chat_input("Ask a question about your document...")
         if user_message:
             st.session_state.chat_history.append({"role": "user", "message": user_message})
-            with st.spinner("🤖 Processing your question..."):
-                response = chat_with_document(st.session_state.extracted_text, user_message)
+            st.chat_message("user").write(user_message)
+            # Answer from the passages most relevant to the question, falling back to the opening excerpt
+            chat_index = build_chat_index(st.session_state.extracted_text)
+            context = select_chat_context(chat_index, user_message) or st.session_state.doc_excerpt
+            # Render the answer as it streams in rather than waiting for the full response
+            with st.chat_message("assistant"):
+                response = st.write_stream(chat_with_document(context, user_message))
             st.session_state.chat_history.append({"role": "assistant", "message": response})
-            st.rerun()
     else:
         st.info("Please upload a document in the Upload tab first.")
 
@@ -795,49 +847,24 @@ with st.sidebar:
         # Only show export options if content is selected
         if selected_content:
             # Generate content for export
-            export_content = ""
-            
-            if "Summary" in selected_content and st.session_state.get("summary"):
-                export_content += "DOCUMENT SUMMARY\n"
-                export_content += "=" * 50 + "\n"
-                export_content += st.session_state.summary + "\n\n"
-                
-            if "Risk Analysis" in selected_content and st.session_state.get("risks"):
-                export_content += "RISK ANALYSIS\n"
-                export_content += "=" * 50 + "\n"
-                export_content += st.session_state.risks + "\n\n"
+            export_content = build_export_content(
+                st.session_state.get("summary"), st.session_state.get("risks"), selected_content)
                 
             # Export format selection
             export_format = st.selectbox(
                 "Choose export format:",
-                ["PDF", "DOCX", "TXT"]
+                list(EXPORT_FORMATS)
             )
             
-            # Add download button
-            if export_format == "PDF":
-                pdf_buffer = generate_pdf(export_content)
-                st.download_button(
-                    label="Download PDF",
-                    data=pdf_buffer,
-                    file_name="legal_analysis.pdf",
-                    mime="application/pdf"
-                )
-            elif export_format == "DOCX":
-                docx_buffer = generate_docx(export_content)
-                st.download_button(
-                    label="Download DOCX",
-                    data=docx_buffer,
-                    file_name="legal_analysis.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                )
-            else:  # TXT format
-                txt_content = generate_txt(export_content)
-                st.download_button(
-                    label="Download TXT",
-                    data=txt_content,
-                    file_name="legal_analysis.txt",
-                    mime="text/plain"
-                )
+            # Add download button; only the selected format is generated, and the cached
+            # generators make reruns and switching back to a format free
+            generate, file_name, mime = EXPORT_FORMATS[export_format]
+            st.download_button(
+                label=f"Download {export_format}",
+                data=generate(export_content, st.session_state['report_timestamp']),
+                file_name=file_name,
+                mime=mime
+            )
     else:
         st.info("Upload a document and analyze it to enable download options.")
     
@@ -845,14 +872,7 @@ with st.sidebar:
     st.markdown("---")
     
     # Check if email is configured
-    email_configured = False
-    try:
-        if "email" in st.secrets and all(key in st.secrets["email"] for key in ["SMTP_SERVER", "SMTP_PORT", "SENDER_EMAIL", "SENDER_PASSWORD"]):
-            email_configured = True
-    except Exception as e:
-        logging.error(f"Error checking email configuration: {str(e)}")
-    
-    if email_configured:
+    if email_configured():
         if st.session_state.get("summary") or st.session_state.get("risks"):
             # Email UI is in a separate function in email_service.py
             try:
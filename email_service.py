@@ -1,164 +1,327 @@
-import smtplib
 import streamlit as st
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
+import functools
 import io
 import logging
-from fpdf import FPDF  # Add this import for PDF generation
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 
+# smtplib, email.mime and the PDF writer are imported by the functions that use them, so
+# showing the email form does not load them until an email is actually sent.
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Divider placed under each section header in the email content
+SECTION_RULE = "-" * 30
+
+# Seconds a rendered email attachment is kept for resends of the same content
+EMAIL_CACHE_TTL = 24 * 60 * 60
+
 # Add a local PDF generation function to avoid importing from app.py
 def generate_email_pdf(content):
-    """Generate a professionally formatted PDF for email attachment"""
+    """Generate a professionally formatted PDF for email attachment, returned as bytes"""
     try:
-        pdf = FPDF()
-        pdf.add_page()
-        
-        # Add a header with logo placeholder
-        pdf.set_font("Arial", "B", 16)
-        pdf.cell(190, 10, "Legal Document Analysis", 0, 1, "C")
-        pdf.set_font("Arial", "I", 10)
-        pdf.cell(190, 5, f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')}", 0, 1, "C")
-        pdf.line(10, 25, 200, 25)
-        pdf.ln(5)
-        
-        # Process the content by sections
-        content_parts = content.split("\n\n")
-        
-        for part in content_parts:
-            if "DOCUMENT SUMMARY" in part:
-                # Summary section
-                pdf.set_font("Arial", "B", 14)
-                pdf.cell(190, 10, "Document Summary", 0, 1, "L")
-                pdf.set_font("Arial", "", 11)
-                
-                # Get the content after the header
-                summary_content = part.split("-" * 30)[1].strip() if "-" * 30 in part else part
-                
-                # Format the content with proper line breaks
-                pdf.multi_cell(190, 7, summary_content)
-                pdf.ln(5)
-                
-            elif "RISK SCORE" in part:
-                # Risk score section
-                pdf.set_font("Arial", "B", 14)
-                pdf.cell(190, 10, "Risk Assessment Score", 0, 1, "L")
-                pdf.set_font("Arial", "", 11)
-                
-                # Get the content after the header
-                score_content = part.split("-" * 30)[1].strip() if "-" * 30 in part else part
-                
-                # Format the content with proper line breaks
-                pdf.multi_cell(190, 7, score_content)
-                pdf.ln(5)
-                
-            elif "RISK ANALYSIS" in part:
-                # Risk analysis section
-                pdf.set_font("Arial", "B", 14)
-                pdf.cell(190, 10, "Detailed Risk Analysis", 0, 1, "L")
-                pdf.set_font("Arial", "", 11)
-                
-                # Get the content after the header
-                analysis_content = part.split("-" * 30)[1].strip() if "-" * 30 in part else part
-                
-                # Format the content with proper line breaks
-                pdf.multi_cell(190, 7, analysis_content)
-                pdf.ln(5)
-            
-            else:
-                # Other content
-                pdf.set_font("Arial", "", 11)
-                pdf.multi_cell(190, 7, part)
-                pdf.ln(3)
-        
-        # Add footer
-        pdf.set_y(-15)
-        pdf.set_font("Arial", "I", 8)
-        pdf.cell(0, 10, f"Page {pdf.page_no()}/{{nb}}", 0, 0, "C")
-        
-        pdf_bytes = pdf.output(dest="S").encode("latin1")
-        buf = io.BytesIO(pdf_bytes)
-        buf.seek(0)
-        return buf
-        
+        # Stamped when the analysis was produced, so resends keep hitting the render cache
+        generated_on = st.session_state.get('report_timestamp') or datetime.now().strftime('%Y-%m-%d %H:%M')
+        return render_email_pdf(content, generated_on)
     except Exception as e:
         logging.error(f"Error generating PDF: {str(e)}")
         # Return None on error, will be handled in email_ui_section
         return None
 
-def send_email(recipient_email, subject, body, attachment=None, attachment_name=None, attachment_type=None):
+# Errors propagate out of the cached renderer so a failed PDF is never cached. The renderer
+# stays on the pinned fpdf (via FastPDF) rather than another PDF library; each section is laid
+# out with a single multi_cell call and repeat sends are served from the cache.
+@st.cache_data(ttl=EMAIL_CACHE_TTL, max_entries=16, show_spinner=False)
+def render_email_pdf(content, generated_on):
+    """Render the email attachment PDF and return its bytes"""
+    from pdf_writer import FastPDF
+    
+    pdf = FastPDF()
+    pdf.add_page()
+    
+    # Add a header with logo placeholder
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(190, 10, "Legal Document Analysis", 0, 1, "C")
+    pdf.set_font("Arial", "I", 10)
+    pdf.cell(190, 5, f"Generated on {generated_on}", 0, 1, "C")
+    pdf.line(10, 25, 200, 25)
+    pdf.ln(5)
+    
+    # Process the content by sections
+    content_parts = content.split("\n\n")
+    
+    for part in content_parts:
+        if "DOCUMENT SUMMARY" in part:
+            # Summary section
+            pdf.set_font("Arial", "B", 14)
+            pdf.cell(190, 10, "Document Summary", 0, 1, "L")
+            pdf.set_font("Arial", "", 11)
+            
+            # Get the content after the header
+            _, rule, after = part.partition(SECTION_RULE)
+            summary_content = after.strip() if rule else part
+            
+            # Format the content with proper line breaks
+            pdf.multi_cell(190, 7, summary_content)
+            pdf.ln(5)
+            
+        elif "RISK SCORE" in part:
+            # Risk score section
+            pdf.set_font("Arial", "B", 14)
+            pdf.cell(190, 10, "Risk Assessment Score", 0, 1, "L")
+            pdf.set_font("Arial", "", 11)
+            
+            # Get the content after the header
+            _, rule, after = part.partition(SECTION_RULE)
+            score_content = after.strip() if rule else part
+            
+            # Format the content with proper line breaks
+            pdf.multi_cell(190, 7, score_content)
+            pdf.ln(5)
+            
+        elif "RISK ANALYSIS" in part:
+            # Risk analysis section
+            pdf.set_font("Arial", "B", 14)
+            pdf.cell(190, 10, "Detailed Risk Analysis", 0, 1, "L")
+            pdf.set_font("Arial", "", 11)
+            
+            # Get the content after the header
+            _, rule, after = part.partition(SECTION_RULE)
+            analysis_content = after.strip() if rule else part
+            
+            # Format the content with proper line breaks
+            pdf.multi_cell(190, 7, analysis_content)
+            pdf.ln(5)
+        
+        else:
+            # Other content
+            pdf.set_font("Arial", "", 11)
+            pdf.multi_cell(190, 7, part)
+            pdf.ln(3)
+    
+    # Add footer
+    pdf.set_y(-15)
+    pdf.set_font("Arial", "I", 8)
+    pdf.cell(0, 10, f"Page {pdf.page_no()}/{{nb}}", 0, 0, "C")
+    
+    # FastPDF.output returns the finished document as bytes
+    return pdf.output()
+
+# Maximum number of recipients addressed in a single SMTP transaction
+RECIPIENTS_PER_MESSAGE = 50
+
+# Separators accepted between addresses in the recipients field
+_RECIPIENT_SEPARATOR_RE = re.compile(r"[\s,;]+")
+
+# Seconds to wait on the SMTP server before giving up on a connection or command
+SMTP_TIMEOUT = 30
+
+@st.cache_resource
+def _smtp_session(smtp_server, smtp_port, sender_email):
+    """Shared slot for one account's SMTP connection; the lock serializes sends over it"""
+    return {"connection": None, "lock": threading.Lock()}
+
+def smtp_account():
+    """
+    Read the SMTP settings from Streamlit secrets, together with the account's pooled session.
+    Both need the script thread, so background sends get them resolved in advance.
+    """
+    settings = st.secrets["email"]
+    account = {
+        "server": settings["SMTP_SERVER"],
+        "port": int(settings["SMTP_PORT"]),
+        "sender": settings["SENDER_EMAIL"],
+        "password": settings["SENDER_PASSWORD"],
+    }
+    account["session"] = _smtp_session(account["server"], account["port"], account["sender"])
+    return account
+
+def _smtp_connect(account):
+    """Open an authenticated SMTP connection"""
+    import smtplib
+    
+    server = smtplib.SMTP(account["server"], account["port"], timeout=SMTP_TIMEOUT)
+    server.starttls()
+    server.login(account["sender"], account["password"])
+    return server
+
+def deliver_message(msg, recipients, account):
+    """
+    Send a message to the recipients over the account's pooled SMTP connection, in batches of
+    RECIPIENTS_PER_MESSAGE addresses per SMTP transaction. Recipients are only passed in the
+    SMTP envelope, never written into the headers, so no one sees the other addresses.
+    The connection is checked with NOOP before use and reopened if the server dropped it.
+    """
+    import smtplib
+    
+    session = account["session"]
+    with session["lock"]:
+        server = session["connection"]
+        if server is not None:
+            try:
+                if server.noop()[0] != 250:
+                    server = None
+            except (smtplib.SMTPException, OSError):
+                server = None
+        
+        if server is None:
+            server = session["connection"] = _smtp_connect(account)
+        
+        for start in range(0, len(recipients), RECIPIENTS_PER_MESSAGE):
+            batch = recipients[start:start + RECIPIENTS_PER_MESSAGE]
+            try:
+                server.send_message(msg, to_addrs=batch)
+            except smtplib.SMTPServerDisconnected:
+                # Dropped mid-session; reconnect once
+                server = session["connection"] = _smtp_connect(account)
+                server.send_message(msg, to_addrs=batch)
+
+@functools.lru_cache(maxsize=4)
+def _encoded_attachment(data):
+    """Base64-encode binary attachment data, once per attachment across repeated sends"""
+    from email.encoders import encode_base64
+    from email.mime.base import MIMEBase
+    
+    carrier = MIMEBase("application", "octet-stream")
+    carrier.set_payload(data)
+    encode_base64(carrier)
+    return carrier.get_payload()
+
+def attachment_part(data, attachment_name, attachment_type):
+    """
+    Build a fresh MIME part for an attachment. Only the encoded payload is cached, so no part
+    object is ever shared between messages.
+    """
+    from email.encoders import encode_noop
+    from email.mime.application import MIMEApplication
+    from email.mime.text import MIMEText
+    
+    if attachment_type == "txt":
+        part = MIMEText(data)
+    else:  # pdf, docx
+        part = MIMEApplication(_encoded_attachment(data), _encoder=encode_noop, Name=attachment_name)
+        part['Content-Transfer-Encoding'] = 'base64'
+    part['Content-Disposition'] = f'attachment; filename="{attachment_name}"'
+    return part
+
+def send_email(recipients, subject, body, attachment=None, attachment_name=None, attachment_type=None, account=None):
     """
     Send an email with optional attachment
     
     Parameters:
-    - recipient_email: Email address of the recipient
+    - recipients: Email address of the recipient, or a list of addresses
     - subject: Email subject
     - body: Email body content
     - attachment: Binary data for attachment (optional)
     - attachment_name: Name of the attachment file (optional)
     - attachment_type: Type of attachment (pdf, docx, txt) (optional)
+    - account: SMTP settings and session from smtp_account() (optional; read here when omitted)
     
     Returns:
     - (success, message): Tuple with success status and message
     """
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    
     try:
         # Get email credentials from Streamlit secrets
         # These should be set in your .streamlit/secrets.toml file
-        smtp_server = st.secrets["email"]["SMTP_SERVER"]
-        smtp_port = int(st.secrets["email"]["SMTP_PORT"])
-        sender_email = st.secrets["email"]["SENDER_EMAIL"]
-        sender_password = st.secrets["email"]["SENDER_PASSWORD"]
+        if account is None:
+            account = smtp_account()
         
         # Log the configuration (omitting password)
-        logging.info(f"Email configuration: Server={smtp_server}, Port={smtp_port}, Email={sender_email}")
+        logging.info(f"Email configuration: Server={account['server']}, Port={account['port']}, Email={account['sender']}")
         
         # Validate email configuration
-        if not all([smtp_server, smtp_port, sender_email, sender_password]):
+        if not all([account["server"], account["port"], account["sender"], account["password"]]):
             return False, "Email configuration is incomplete. Please check your Streamlit secrets."
             
         # Create message
         msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = recipient_email
+        msg['From'] = account["sender"]
         msg['Subject'] = subject
         
         # Add body
         msg.attach(MIMEText(body, 'plain'))
         
         # Add attachment if provided
-        if attachment and attachment_name and attachment_type:
-            attachment_data = attachment
-            
-            # Create attachment
-            if attachment_type == "pdf":
-                part = MIMEApplication(attachment_data.read() if hasattr(attachment_data, 'read') else attachment_data, Name=attachment_name)
-                part['Content-Disposition'] = f'attachment; filename="{attachment_name}"'
-                msg.attach(part)
-            elif attachment_type == "docx":
-                part = MIMEApplication(attachment_data.getvalue(), Name=attachment_name)
-                part['Content-Disposition'] = f'attachment; filename="{attachment_name}"'
-                msg.attach(part)
-            elif attachment_type == "txt":
-                part = MIMEText(attachment_data)
-                part['Content-Disposition'] = f'attachment; filename="{attachment_name}"'
-                msg.attach(part)
-                
-        # Connect to server and send
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            
+        if attachment and attachment_name and attachment_type in ("pdf", "docx", "txt"):
+            if hasattr(attachment, 'getvalue'):
+                attachment = attachment.getvalue()
+            msg.attach(attachment_part(attachment, attachment_name, attachment_type))
+        
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        # A sole recipient sees their own address; several are delivered Bcc-style
+        msg['To'] = recipients[0] if len(recipients) == 1 else "undisclosed-recipients:;"
+        
+        # Send over the pooled connection; it stays open for later emails
+        deliver_message(msg, recipients, account)
+        
+        if len(recipients) > 1:
+            return True, f"Email sent successfully to {len(recipients)} recipients!"
         return True, "Email sent successfully!"
         
     except Exception as e:
         logging.error(f"Error sending email: {str(e)}")
         return False, f"Error sending email: {str(e)}"
 
+# Seconds between checks on an email being sent in the background
+MAIL_STATUS_POLL_SECONDS = 2
+
+@st.cache_resource
+def _mail_queue():
+    """Single background worker that sends queued emails one at a time, in order"""
+    return ThreadPoolExecutor(max_workers=1)
+
+def queue_email(*args):
+    """
+    Hand send_email off to the background mail worker and remember it for this session.
+    The worker has no script context, so the secrets and SMTP session are resolved here first.
+    """
+    try:
+        account = smtp_account()
+    except Exception as e:
+        logging.error(f"Error sending email: {str(e)}")
+        # Reported through the same status display as a failed background send
+        st.session_state.mail_future = Future()
+        st.session_state.mail_future.set_result((False, f"Error sending email: {str(e)}"))
+        return
+    
+    st.session_state.mail_future = _mail_queue().submit(send_email, *args, account=account)
+
+@st.fragment(run_every=MAIL_STATUS_POLL_SECONDS)
+def _poll_email_status():
+    """Show a sending notice, rerunning the app once the background send finishes"""
+    future = st.session_state.get("mail_future")
+    if future is None or future.done():
+        st.rerun()
+    st.info("📧 Sending email...")
+
+def show_email_status():
+    """Show the outcome of this session's background email, or a notice while it is still sending"""
+    future = st.session_state.get("mail_future")
+    if future is None:
+        return
+    
+    if not future.done():
+        _poll_email_status()
+        return
+    
+    st.session_state.mail_future = None
+    success, message = future.result()
+    if success:
+        st.success("✅ " + message)
+    else:
+        st.error("❌ " + message)
+
+def parse_recipients(text):
+    """Split the recipients field into addresses separated by commas, semicolons or whitespace"""
+    return [address for address in _RECIPIENT_SEPARATOR_RE.split(text) if address]
+
 def validate_email(email):
     """Simple email validation"""
     if not email:
@@ -171,96 +334,138 @@ def validate_email(email):
     # Check for common domains (very basic validation)
     return True
 
-def prepare_email_content(include_summary, include_risk_score, include_risks, include_visuals):
-    """Prepare well-formatted content for email"""
-    email_content = []
+@st.cache_data(ttl=EMAIL_CACHE_TTL, max_entries=16, show_spinner=False)
+def prepare_email_content(summary, risks, include_summary, include_risk_score, include_risks, include_visuals):
+    """Prepare well-formatted content for email from the document summary and risk analysis"""
+    # Entries are separated by a blank line; every section starts with its header entry
+    buf = io.StringIO()
+    
+    def write(*entries):
+        for entry in entries:
+            if buf.tell():
+                buf.write("\n\n")
+            buf.write(entry)
+    
+    def write_numbered(header, risks):
+        write(header)
+        buf.writelines(f"\n\n{i}. {risk}" for i, risk in enumerate(risks, 1))
     
     # Add document summary if selected
-    if include_summary and st.session_state.get("summary"):
-        email_content.append("DOCUMENT SUMMARY")
-        email_content.append("-" * 30)
+    if include_summary and summary:
+        write("DOCUMENT SUMMARY", SECTION_RULE)
         
-        summary = st.session_state.summary
         # Format summary if needed (e.g., bullet points)
         if not summary.startswith("•") and not summary.startswith("-"):
             # Try to add some basic formatting if not already formatted
-            paragraphs = [p.strip() for p in summary.split("\n") if p.strip()]
-            formatted_summary = "\n\n".join(paragraphs)
-            email_content.append(formatted_summary)
+            write("\n\n".join(p for p in (line.strip() for line in summary.split("\n")) if p))
         else:
-            email_content.append(summary)
+            write(summary)
     
     # Add risk score if selected
-    if include_risk_score and st.session_state.get("risks"):
-        email_content.append("\nRISK SCORE")
-        email_content.append("-" * 30)
+    if include_risk_score and risks:
+        write("\nRISK SCORE", SECTION_RULE)
         
         # Calculate the actual risk score
-        if isinstance(st.session_state.risks, str):
+        if isinstance(risks, str):
             # Try to calculate a score from the text
-            score, high, medium, low = calculate_risk_counts(st.session_state.risks)
+            score, high, medium, low = calculate_risk_counts(risks)
             
-            email_content.append(f"Overall Risk Score: {score}/100")
-            email_content.append(f"Risk Level: {'High' if score >= 70 else 'Medium' if score >= 40 else 'Low'}")
-            email_content.append(f"High Priority Issues: {high}")
-            email_content.append(f"Medium Priority Issues: {medium}")
-            email_content.append(f"Low Priority Issues: {low}")
+            write(
+                f"Overall Risk Score: {score}/100",
+                f"Risk Level: {'High' if score >= 70 else 'Medium' if score >= 40 else 'Low'}",
+                f"High Priority Issues: {high}",
+                f"Medium Priority Issues: {medium}",
+                f"Low Priority Issues: {low}",
+            )
         else:
-            email_content.append("Risk score analysis is included in the detailed risk section.")
+            write("Risk score analysis is included in the detailed risk section.")
     
     # Add risk analysis if selected
-    if include_risks and st.session_state.get("risks"):
-        email_content.append("\nRISK ANALYSIS")
-        email_content.append("-" * 30)
+    if include_risks and risks:
+        write("\nRISK ANALYSIS", SECTION_RULE)
         
-        if isinstance(st.session_state.risks, str):
-            # Format the risks text
-            risks_text = st.session_state.risks
-            
+        if isinstance(risks, str):
             # Try to categorize the risks by severity
-            high_risks, medium_risks, low_risks = categorize_risks(risks_text)
+            high_risks, medium_risks, low_risks = categorize_risks(risks)
             
             if high_risks:
-                email_content.append("\nHIGH PRIORITY RISKS:")
-                for i, risk in enumerate(high_risks, 1):
-                    email_content.append(f"{i}. {risk}")
+                write_numbered("\nHIGH PRIORITY RISKS:", high_risks)
             
             if medium_risks:
-                email_content.append("\nMEDIUM PRIORITY RISKS:")
-                for i, risk in enumerate(medium_risks, 1):
-                    email_content.append(f"{i}. {risk}")
+                write_numbered("\nMEDIUM PRIORITY RISKS:", medium_risks)
             
             if low_risks:
-                email_content.append("\nLOW PRIORITY RISKS:")
-                for i, risk in enumerate(low_risks, 1):
-                    email_content.append(f"{i}. {risk}")
+                write_numbered("\nLOW PRIORITY RISKS:", low_risks)
                 
             if not (high_risks or medium_risks or low_risks):
                 # If categorization failed, just include the text
-                email_content.append(risks_text)
+                write(risks)
         else:
-            email_content.append("Detailed risk analysis is not available in text format.")
+            write("Detailed risk analysis is not available in text format.")
     
-    return "\n\n".join(email_content)
+    return buf.getvalue()
 
-def calculate_risk_counts(risks_text):
-    """Calculate risk counts and score from text for better formatting"""
-    # Count occurrences of risk-related keywords
-    text_lower = risks_text.lower()
-    
-    # Count sentences containing risk keywords
-    sentences = [s.strip() for s in text_lower.split('.') if s.strip()]
+# Keywords behind the email risk score; a sentence can count towards both high and medium
+SCORE_HIGH_TERMS = ('critical', 'severe', 'high risk', 'significant', 'major')
+SCORE_MEDIUM_TERMS = ('moderate', 'medium', 'potential', 'concerning')
+# Substantial sentences count as low risk unless they mention one of these
+SCORE_EXCLUDED_TERMS = ('critical', 'severe', 'high risk', 'moderate', 'medium', 'potential')
+
+# Keywords used to list each risk sentence under exactly one priority
+CATEGORY_HIGH_TERMS = ('critical', 'severe', 'high')
+CATEGORY_MEDIUM_TERMS = ('moderate', 'medium')
+
+def _terms_pattern(terms):
+    """Compile a case-insensitive alternation matching any of the terms as a substring"""
+    return re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+
+_SCORE_HIGH_RE = _terms_pattern(SCORE_HIGH_TERMS)
+_SCORE_MEDIUM_RE = _terms_pattern(SCORE_MEDIUM_TERMS)
+_SCORE_EXCLUDED_RE = _terms_pattern(SCORE_EXCLUDED_TERMS)
+_CATEGORY_HIGH_RE = _terms_pattern(CATEGORY_HIGH_TERMS)
+_CATEGORY_MEDIUM_RE = _terms_pattern(CATEGORY_MEDIUM_TERMS)
+
+@functools.lru_cache(maxsize=32)
+def scan_risk_sentences(risks_text):
+    """
+    Classify every risk sentence in one pass.
+    Returns the (high, medium, low) counts behind the risk score and the
+    (high, medium, low) sentence tuples used to list the risks by priority.
+    """
+    if not risks_text or risks_text.isspace():
+        return (0, 0, 0), ((), (), ())
     
-    high_count = sum(1 for s in sentences if any(word in s for word in 
-                     ['critical', 'severe', 'high risk', 'significant', 'major']))
+    high_count = medium_count = low_count = 0
+    high_risks, medium_risks, low_risks = [], [], []
     
-    medium_count = sum(1 for s in sentences if any(word in s for word in 
-                       ['moderate', 'medium', 'potential', 'concerning']))
+    for sentence in risks_text.split('.'):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        
+        substantial = len(sentence.split()) > 5
+        
+        # Score counts
+        if _SCORE_HIGH_RE.search(sentence):
+            high_count += 1
+        if _SCORE_MEDIUM_RE.search(sentence):
+            medium_count += 1
+        if substantial and not _SCORE_EXCLUDED_RE.search(sentence):
+            low_count += 1
+        
+        # Priority lists
+        if _CATEGORY_HIGH_RE.search(sentence):
+            high_risks.append(sentence)
+        elif _CATEGORY_MEDIUM_RE.search(sentence):
+            medium_risks.append(sentence)
+        elif substantial:  # Only include as low risk if it's a substantial sentence
+            low_risks.append(sentence)
     
-    # Count remaining sentences as low risks if they're substantial
-    low_count = sum(1 for s in sentences if len(s.split()) > 5 and not 
-                   any(word in s for word in ['critical', 'severe', 'high risk', 
-                                             'moderate', 'medium', 'potential']))
+    return (high_count, medium_count, low_count), (tuple(high_risks), tuple(medium_risks), tuple(low_risks))
+
+def calculate_risk_counts(risks_text):
+    """Calculate risk counts and score from text for better formatting"""
+    (high_count, medium_count, low_count), _ = scan_risk_sentences(risks_text)
     
     total = high_count + medium_count + low_count
     if total == 0:
@@ -273,37 +478,56 @@ def calculate_risk_counts(risks_text):
 
 def categorize_risks(risks_text):
     """Categorize risks into high, medium, and low for better formatting"""
-    high_risks = []
-    medium_risks = []
-    low_risks = []
+    _, (high_risks, medium_risks, low_risks) = scan_risk_sentences(risks_text)
+    return list(high_risks), list(medium_risks), list(low_risks)
+
+def build_attachment(summary, risks, include_summary, include_risk_score, include_risks, include_visuals, format_option):
+    """
+    Prepare the email attachment as (attachment, attachment_name, attachment_type).
+    The last attachment is reused while the analysis and the selected options are unchanged,
+    so editing only the recipients or subject does not rebuild it.
+    """
+    # The fingerprint holds the analysis strings themselves, so matching them is an identity check
+    fingerprint = (summary, risks, include_summary, include_risk_score, include_risks, include_visuals, format_option)
+    previous = st.session_state.get("email_attachment")
+    if previous is not None and previous[0] == fingerprint:
+        return previous[1]
     
-    # Split into sentences
-    sentences = [s.strip() for s in risks_text.split('.') if s.strip()]
+    # Use the enhanced content preparation function
+    combined_content = prepare_email_content(
+        summary, risks, include_summary, include_risk_score, include_risks, include_visuals)
     
-    for sentence in sentences:
-        sentence_lower = sentence.lower()
-        if any(word in sentence_lower for word in ['critical', 'severe', 'high']):
-            high_risks.append(sentence)
-        elif any(word in sentence_lower for word in ['moderate', 'medium']):
-            medium_risks.append(sentence)
-        elif len(sentence.split()) > 5:  # Only include as low risk if it's a substantial sentence
-            low_risks.append(sentence)
+    if format_option == "Text (.txt)":
+        prepared = (combined_content, "document_analysis.txt", "txt")
+    else:  # PDF
+        # Use our enhanced PDF generator
+        pdf_bytes = generate_email_pdf(combined_content)
+        if pdf_bytes is None:
+            # Not remembered, so the next send tries the PDF again
+            st.error("❌ Failed to generate PDF. Sending as text instead.")
+            return combined_content, "document_analysis.txt", "txt"
+        prepared = (pdf_bytes, "document_analysis.pdf", "pdf")
     
-    return high_risks, medium_risks, low_risks
+    st.session_state.email_attachment = (fingerprint, prepared)
+    return prepared
 
 def email_ui_section():
     """Display the email UI in the sidebar"""
     st.subheader("📧 Send Email")
-    # Check if we have content to email
-    has_summary = st.session_state.get("summary") is not None
-    has_risks = st.session_state.get("risks") is not None
+    # Check if we have content to email; session state is read once per rerun
+    summary = st.session_state.get("summary")
+    risks = st.session_state.get("risks")
+    has_summary = summary is not None
+    has_risks = risks is not None
     
     if not has_summary and not has_risks:
         st.info("No content available to email. Generate a summary or risk analysis first.")
         return
         
     # Email form
-    recipient = st.text_input("Recipient Email Address")
+    recipient_text = st.text_area("Recipient Email Addresses", height=68,
+                                  help="Separate multiple addresses with commas or new lines")
+    recipients = parse_recipients(recipient_text)
     subject = st.text_input("Email Subject", "Legal Document Analysis Results")
     
     # Content selection
@@ -324,63 +548,41 @@ def email_ui_section():
     send_button = st.button("📤 Send Email", use_container_width=True, type="primary")
     
     if send_button:
-        if not validate_email(recipient):
-            st.error("⚠️ Please enter a valid email address")
+        if not recipients or not all(validate_email(address) for address in recipients):
+            st.error("⚠️ Please enter valid email addresses")
         elif not any([include_summary, include_risk_score, include_risks]):
             st.warning("⚠️ Please select at least one content type to include")
         else:
-            # Use the enhanced content preparation function
-            combined_content = prepare_email_content(
-                include_summary, include_risk_score, include_risks, include_visuals)
-            
             # Generate attachment based on format
             try:
-                if format_option == "Text (.txt)":
-                    attachment = combined_content
-                    attachment_name = "document_analysis.txt"
-                    attachment_type = "txt"
-                else:  # PDF
-                    # Use our enhanced PDF generator
-                    attachment = generate_email_pdf(combined_content)
-                    if attachment is None:
-                        st.error("❌ Failed to generate PDF. Sending as text instead.")
-                        attachment = combined_content
-                        attachment_name = "document_analysis.txt"
-                        attachment_type = "txt"
-                    else:
-                        attachment_name = "document_analysis.pdf"
-                        attachment_type = "pdf"
+                attachment, attachment_name, attachment_type = build_attachment(
+                    summary, risks, include_summary, include_risk_score, include_risks, include_visuals, format_option)
                 
-                with st.spinner("📧 Sending email..."):
-                    success, message = send_email(
-                        recipient, 
-                        subject, 
-                        "Please find attached your document analysis from the Legal Document Assistant.",
-                        attachment,
-                        attachment_name,
-                        attachment_type
-                    )
-                    
-                    if success:
-                        st.success("✅ " + message)
-                    else:
-                        st.error("❌ " + message)
+                queue_email(
+                    recipients, 
+                    subject, 
+                    "Please find attached your document analysis from the Legal Document Assistant.",
+                    attachment,
+                    attachment_name,
+                    attachment_type
+                )
             except Exception as e:
                 st.error(f"❌ Error preparing email: {str(e)}")
                 # Try to send as plain text if PDF fails
                 try:
                     st.info("Attempting to send as plain text instead...")
-                    success, message = send_email(
-                        recipient,
+                    combined_content = prepare_email_content(
+                        summary, risks, include_summary, include_risk_score, include_risks, include_visuals)
+                    queue_email(
+                        recipients,
                         subject,
                         "Please find attached your document analysis from the Legal Document Assistant.",
                         combined_content,
                         "document_analysis.txt",
                         "txt"
                     )
-                    if success:
-                        st.success("✅ " + message)
-                    else:
-                        st.error("❌ " + message)
                 except Exception as e2:
-                    st.error(f"❌ Email sending failed completely: {str(e2)}") 
\ No newline at end of file
+                    st.error(f"❌ Email sending failed completely: {str(e2)}") 
+    
+    # Report on the email being sent in the background, if any
+    show_email_status()
@@ -10,280 +10,220 @@ These features ensure the application adheres to GDPR requirements for data prot
 """
 
 import streamlit as st
+import functools
+import logging
 import os
+import re
 
-# Path to the privacy policy HTML file
+# Path to the privacy policy HTML file, served by Streamlit's static file serving
 PRIVACY_POLICY_FILE = "privacy_policy.html"
-PRIVACY_POLICY_PATH = os.path.join(os.getcwd(), PRIVACY_POLICY_FILE)
+PRIVACY_POLICY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", PRIVACY_POLICY_FILE)
+PRIVACY_POLICY_URL = f"app/static/{PRIVACY_POLICY_FILE}"
+PRIVACY_POLICY_FRAME_HEIGHT = 800
 
-# GDPR information iframe URL
-GDPR_INFO_URL = "https://gdpr-info.eu/" 
-
-# Privacy policy content as markdown
-PRIVACY_POLICY_MARKDOWN = """
-# Privacy Policy
-
-## 1. Overview
-
-Welcome to AI Legal Document Assistant. We are committed to protecting your privacy and handling your data with transparency and care. This Privacy Policy explains how we collect, use, and safeguard your information.
-
-**Last Updated: June 2024**  
-**Effective Date: June 1, 2024**
-
-## 2. Information We Collect
-
-### 2.1 Document Data
-* Legal documents uploaded for analysis
-* Text content extracted from documents
-* Document metadata (file names, timestamps, size)
-* Analysis results and generated summaries
-
-### 2.2 User Information
-* Account information (if applicable)
-* Usage patterns and preferences
-* Technical data (IP address, browser type, device information)
-* Session duration and feature interaction data
-
-## 3. How We Use Your Information
-
-### 3.1 Primary Purposes
-* Providing document analysis and risk assessment services
-* Generating summaries and insights from uploaded documents
-* Improving our AI algorithms and service accuracy
-* Maintaining service security and performance
-
-### 3.2 Legal Basis for Processing
-* **Contractual Necessity**: To provide our services
-* **Legitimate Interests**: To improve and secure our services
-* **Legal Compliance**: To meet regulatory requirements
-* **Consent**: For specific data processing activities
-
-## 4. Data Protection Measures
-
-We implement industry-standard security measures including:
-
-* 256-bit SSL/TLS encryption for data transmission
-* AES-256 encryption for stored documents
-* Regular security audits and penetration testing
-* Strict access controls and authentication
-* Automated threat detection and prevention
-
-## 5. Data Retention and Deletion
-
-### 5.1 Retention Periods
-* Uploaded documents: 30 days from last access
-* Analysis results: 60 days from generation
-* Account information: Duration of account activity
-* Usage logs: 90 days rolling period
-
-### 5.2 Automatic Deletion
-* Documents are automatically deleted after the retention period
-* Users can request immediate deletion at any time
-* Backup copies are removed within 30 days of deletion
-
-## 6. Your Privacy Rights
-
-Under GDPR and other privacy laws, you have the right to:
-
-* Access your personal data
-* Correct inaccurate data
-* Request data deletion
-* Restrict processing
-* Data portability
-* Object to processing
-* Withdraw consent
-* Lodge complaints with supervisory authorities
-
-## 7. International Data Transfers
-
-We may transfer your data to:
-
-* Cloud servers in the EU and US
-* AI processing centers in secure locations
-* Third-party service providers
+# GDPR consent state variables and their defaults, set up by utils.initialize_session_state
+GDPR_SESSION_DEFAULTS = (
+    ("gdpr_consent", False),
+    ("show_gdpr_banner", True),
+    ("show_privacy_policy", False),
+)
 
-All transfers comply with:
-* EU Standard Contractual Clauses
-* Privacy Shield Framework
-* Adequacy decisions where applicable
+# Query parameter recording consent in the app URL, so reloads and bookmarked links keep it
+CONSENT_QUERY_PARAM = "gdpr"
 
-## 8. Cookie Policy
-
-We use essential cookies for:
-* Session management
-* Security measures
-* Performance monitoring
-
-Optional cookies for:
-* Analytics and usage patterns
-* Feature preferences
-* Service improvements
-
-## 9. Children's Privacy
-
-Our service is not intended for users under 16 years of age. We do not knowingly collect or process data from children.
-
-## 10. Changes to This Policy
-
-We may update this policy to reflect:
-* Service changes
-* Legal requirements
-* Security improvements
-* User feedback
-
-All changes will be notified via:
-* Email notifications
-* In-app announcements
-* Website updates
-
-## 11. Contact Information
-
-For privacy-related inquiries:
+# GDPR information iframe URL
+GDPR_INFO_URL = "https://gdpr-info.eu/" 
 
-**Data Protection Officer**
-* Email: privacy@legaldocumentassistant.com
-* Phone: +1 (555) 123-4567
-* Address: 123 Legal Tech Street, Suite 100, San Francisco, CA 94105
+# Heading and source note shown above the GDPR information page
+GDPR_INFO_INTRO = "### GDPR Information\n\nThis information is sourced from an external website."
 
-Response Time: Within 48 hours
+# Responsive wrapper for the GDPR information page; the browser only fetches it once it is
+# scrolled into view
+GDPR_IFRAME_HTML = (
+    '<div style="position: relative; padding-bottom: 56.25%; height: 0; overflow: hidden; max-width: 100%; background: #F0F2F6;">'
+    '<iframe loading="lazy" style="position: absolute; top: 0; left: 0; width: 100%; height: 100%; border: none;" '
+    f'src="{GDPR_INFO_URL}" title="GDPR Information" allowfullscreen></iframe>'
+    '</div>'
+)
 
-## 12. Legal Compliance
+# The policy body in privacy_policy.html
+_POLICY_BODY_RE = re.compile(r"<body>(.*?)</body>", re.DOTALL)
 
-We comply with:
-* General Data Protection Regulation (GDPR)
-* California Consumer Privacy Act (CCPA)
-* Other applicable data protection laws
-"""
+def load_privacy_policy_html(path=PRIVACY_POLICY_PATH):
+    """
+    Return the privacy policy body from the pre-rendered HTML file, or None if it cannot be read.
+    Lines are dedented and blank lines dropped to keep the page markup compact.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            match = _POLICY_BODY_RE.search(f.read())
+    except OSError as e:
+        logging.warning(f"Could not read privacy policy file: {str(e)}")
+        return None
+    
+    if not match:
+        return None
+    return "\n".join(line.strip() for line in match.group(1).splitlines() if line.strip())
+
+# All styles for the GDPR banner and the privacy policy page. Policy rules are scoped to the
+# policy wrapper so they never restyle the main app. Streamlit drops any element a rerun does
+# not emit again, so each view still sends this once per run rather than once per session.
+GDPR_CSS = """<style>
+.gdpr-banner-container {
+position: fixed;
+bottom: 0;
+left: 0;
+width: 100%;
+background-color: rgba(240, 242, 246, 0.95);
+padding: 10px 15px;
+z-index: 1000;
+border-top: 1px solid #ddd;
+box-shadow: 0px -2px 5px rgba(0,0,0,0.1);
+}
+.gdpr-banner-content {
+display: flex;
+justify-content: space-between;
+align-items: center;
+max-width: 1200px;
+margin: 0 auto;
+font-size: 0.9em;
+}
+.gdpr-text {
+flex-grow: 1;
+}
+.gdpr-button {
+margin-left: 15px;
+}
+.privacy-policy h1, .privacy-policy h2, .privacy-policy h3 {
+color: #2874A6;
+}
+.privacy-policy h1 {
+border-bottom: 2px solid #2874A6;
+padding-bottom: 10px;
+}
+.privacy-policy h2 {
+margin-top: 30px;
+}
+.privacy-policy .highlight {
+background-color: #F8F9F9;
+padding: 15px;
+border-left: 4px solid #2874A6;
+margin: 10px 0;
+}
+.privacy-policy .contact-box {
+background-color: #EBF5FB;
+padding: 20px;
+border-radius: 5px;
+margin: 20px 0;
+}
+</style>"""
+
+# Consent notice shown above the banner buttons, sent together with the banner styles
+GDPR_BANNER_HTML = (
+    f'{GDPR_CSS}\n<div class="gdpr-text">🔒 This app processes document data. '
+    'By continuing, you consent to our Privacy Policy.</div>'
+)
+
+def privacy_policy_version():
+    """Return the modification time of the policy file, or None if it is missing."""
+    try:
+        return os.stat(PRIVACY_POLICY_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+# Keyed on the file's modification time, so an edited policy is rebuilt once and a missing
+# file is retried once it appears
+@st.cache_data(show_spinner=False, max_entries=2)
+def privacy_policy_page_html(version):
+    """Return the styles and policy as one HTML string, or None if the HTML file is unavailable."""
+    policy_html = load_privacy_policy_html()
+    return f'{GDPR_CSS}\n<div class="privacy-policy">\n{policy_html}\n</div>' if policy_html else None
+
+def restore_gdpr_consent():
+    """Restore consent given earlier from the app URL, so the banner is never drawn for it."""
+    if not st.session_state.gdpr_consent and st.query_params.get(CONSENT_QUERY_PARAM) == "1":
+        st.session_state.gdpr_consent = True
+        st.session_state.show_gdpr_banner = False
+
+# Button callbacks: Streamlit runs these before the rerun a click triggers, so the new state
+# is already visible to that rerun and no second st.rerun() is needed
+def accept_gdpr_consent():
+    """Record consent, in the session and in the app URL."""
+    st.session_state.gdpr_consent = True
+    st.session_state.show_gdpr_banner = False
+    st.query_params[CONSENT_QUERY_PARAM] = "1"
+
+def open_privacy_policy():
+    """Switch the app to the privacy policy page."""
+    st.session_state.show_privacy_policy = True
+
+def close_privacy_policy():
+    """Return from the privacy policy page to the application."""
+    st.session_state.show_privacy_policy = False
 
 def show_gdpr_consent_banner():
     """
     Display a small, unobtrusive GDPR consent popup at the bottom of the screen.
-    Returns True if consent is given, False otherwise.
+    Callers check st.session_state.gdpr_consent for whether consent has been given.
     """
-    if not st.session_state.gdpr_consent and st.session_state.show_gdpr_banner:
-        # Add a small, fixed banner at the bottom with CSS
-        st.markdown("""
-        <style>
-        .gdpr-banner-container {
-            position: fixed;
-            bottom: 0;
-            left: 0;
-            width: 100%;
-            background-color: rgba(240, 242, 246, 0.95);
-            padding: 10px 15px;
-            z-index: 1000;
-            border-top: 1px solid #ddd;
-            box-shadow: 0px -2px 5px rgba(0,0,0,0.1);
-        }
-        .gdpr-banner-content {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            max-width: 1200px;
-            margin: 0 auto;
-            font-size: 0.9em;
-        }
-        .gdpr-text {
-            flex-grow: 1;
-        }
-        .gdpr-button {
-            margin-left: 15px;
-        }
-        </style>
-        """, unsafe_allow_html=True)
-
-        # Create a container at the bottom of the page
-        container = st.container()
-        
-        # Use columns to place the Accept button on the right
-        col1, col2 = st.columns([4, 1])
-        
-        with col1:
-            st.write("🔒 This app processes document data. By continuing, you consent to our Privacy Policy.")
-            if st.button("View Privacy Policy"):
-                st.session_state.show_privacy_policy = True
-                st.rerun()
-        
-        with col2:
-            # Place the button in the right column
-            if st.button("Accept", key="gdpr_accept", use_container_width=True):
-                st.session_state.gdpr_consent = True
-                st.session_state.show_gdpr_banner = False
-                st.rerun()
-        
-        return True
+    # Fast path for every rerun once consent is given or the banner dismissed
+    if st.session_state.gdpr_consent or not st.session_state.show_gdpr_banner:
+        return
     
-    return True
+    # Styles and notice go out as one element, followed by the two buttons
+    st.html(GDPR_BANNER_HTML)
+    st.button("View Privacy Policy", on_click=open_privacy_policy)
+    st.button("Accept", key="gdpr_accept", on_click=accept_gdpr_consent)
+
+@functools.lru_cache(maxsize=1)
+def footer_html(year):
+    """
+    Return the copyright footer for the year, built once per year rather than on every rerun.
+    It also centres the footer's privacy button through the st-key class Streamlit gives keyed widgets.
+    """
+    return (
+        '<style>.st-key-footer_privacy { display: flex; justify-content: center; }</style>'
+        '<div style="text-align: center; padding: 5px; font-size: 0.8em;">'
+        f'© {year} AI Legal Document Assistant'
+        '</div>'
+    )
 
 def add_privacy_policy_footer():
     """
     Add a minimal privacy policy link to the bottom of the page.
     """
     st.markdown("---")
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        if st.button("View Privacy Policy", key="footer_privacy"):
-            st.session_state.show_privacy_policy = True
-            st.rerun()
-        
-    st.markdown(
-        f"""
-        <div style="text-align: center; padding: 5px; font-size: 0.8em;">
-            © {st.session_state.get('current_year', 2024)} AI Legal Document Assistant
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    st.button("View Privacy Policy", key="footer_privacy", on_click=open_privacy_policy)
+    st.html(footer_html(st.session_state['current_year']))
 
 def show_privacy_policy():
     """
     Display the privacy policy page with improved styling.
     """
-    st.markdown("""
-    <style>
-    h1, h2, h3 {
-        color: #2874A6;
-    }
-    h1 {
-        border-bottom: 2px solid #2874A6;
-        padding-bottom: 10px;
-    }
-    h2 {
-        margin-top: 30px;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    if st.get_option("server.enableStaticServing"):
+        # The browser fetches and caches the static page; each rerun only sends the frame
+        from streamlit.components.v1 import iframe
+        iframe(PRIVACY_POLICY_URL, height=PRIVACY_POLICY_FRAME_HEIGHT, scrolling=True)
+    else:
+        page_html = privacy_policy_page_html(privacy_policy_version())
+        if page_html:
+            # Styles and policy go out as a single element
+            st.html(page_html)
+        else:
+            st.warning(f"The privacy policy could not be loaded from {PRIVACY_POLICY_FILE}.")
     
-    st.markdown(PRIVACY_POLICY_MARKDOWN)
-    
-    if st.button("← Back to Application"):
-        st.session_state.show_privacy_policy = False
-        st.rerun()
+    st.button("← Back to Application", on_click=close_privacy_policy)
 
 def show_gdpr_info_iframe():
     """
     Show an iframe with GDPR information from an external source.
     Only shown when explicitly requested by the user.
     """
-    st.markdown("### GDPR Information")
-    st.markdown("""
-    This information is sourced from an external website.
-    """)
+    st.markdown(GDPR_INFO_INTRO)
     
-    # Create responsive iframe with HTML
-    st.markdown(
-        f"""
-        <div style="position: relative; padding-bottom: 56.25%; height: 0; overflow: hidden; max-width: 100%; background: #F0F2F6;">
-            <iframe 
-                style="position: absolute; top: 0; left: 0; width: 100%; height: 100%; border: none;"
-                src="{GDPR_INFO_URL}" 
-                title="GDPR Information"
-                allowfullscreen>
-            </iframe>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+    # Create responsive iframe with HTML; this stays on st.markdown because st.html
+    # sanitizes its input and would strip the iframe
+    st.markdown(GDPR_IFRAME_HTML, unsafe_allow_html=True)
 
 # Placeholder comments for data handling functions
 """
@@ -0,0 +1,48 @@
+"""
+FPDF subclass used for the exported and emailed PDF reports.
+
+Stock FPDF 1.7 assembles the document by appending to a str buffer, which is quadratic in the
+number of PDF operators. FastPDF keeps the buffer as a bytearray instead, and memoizes string
+widths, which the report measures again for every repeated header, footer and heading.
+"""
+
+from fpdf import FPDF
+
+class FastPDF(FPDF):
+    """FPDF with a bytearray output buffer; output() returns the finished document as bytes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buffer = bytearray()
+        self._string_widths = {}
+
+    def _out(self, s):
+        """Add a line to the current page, or to the document buffer outside page content."""
+        if self.state == 2:
+            # Page content stays str; FPDF post-processes it (page-number alias, compression)
+            if isinstance(s, bytes):
+                s = s.decode("latin1")
+            elif not isinstance(s, str):
+                s = str(s)
+            self.pages[self.page] += s + "\n"
+        else:
+            if isinstance(s, str):
+                s = s.encode("latin1")
+            elif not isinstance(s, (bytes, bytearray)):
+                s = str(s).encode("latin1")
+            self.buffer += s
+            self.buffer += b"\n"
+
+    def get_string_width(self, s):
+        """Return the width of the string in the current font, measuring each string once per font."""
+        key = (self.font_family, self.font_style, self.font_size, s)
+        width = self._string_widths.get(key)
+        if width is None:
+            width = self._string_widths[key] = super().get_string_width(s)
+        return width
+
+    def output(self, name="", dest="S"):
+        """Close the document and return it as bytes."""
+        if self.state < 3:
+            self.close()
+        return bytes(self.buffer)
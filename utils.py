@@ -1,19 +1,37 @@
+import logging
+from datetime import date
 import streamlit as st
+from gdpr_compliance import GDPR_SESSION_DEFAULTS
+
+# Secrets that must be present in the [email] section for the email feature
+EMAIL_SETTINGS = frozenset(("SMTP_SERVER", "SMTP_PORT", "SENDER_EMAIL", "SENDER_PASSWORD"))
+
+# Session state defaults; mutable defaults are created per session in initialize_session_state
+SESSION_DEFAULTS = (
+    ("extracted_text", None),
+    ("doc_excerpt", None),
+    ("summary", None),
+    ("risks", None),
+    ("risks_snippet", None),
+    ("export_content", None),
+    ("report_timestamp", None),
+) + GDPR_SESSION_DEFAULTS
 
 def initialize_session_state():
     """Initialize session state variables."""
-    if 'extracted_text' not in st.session_state:
-        st.session_state.extracted_text = None
-    if 'summary' not in st.session_state:
-        st.session_state.summary = None
-    if 'risks' not in st.session_state:
-        st.session_state.risks = None
-    if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
-    # GDPR consent state variables
-    if 'gdpr_consent' not in st.session_state:
-        st.session_state.gdpr_consent = False
-    if 'show_gdpr_banner' not in st.session_state:
-        st.session_state.show_gdpr_banner = True
-    if 'show_privacy_policy' not in st.session_state:
-        st.session_state.show_privacy_policy = False
+    for key, value in SESSION_DEFAULTS:
+        st.session_state.setdefault(key, value)
+    # A new list per session, so chat histories are never shared
+    st.session_state.setdefault("chat_history", [])
+    # Footer copyright year, computed once when the session starts
+    st.session_state.setdefault("current_year", date.today().year)
+
+@st.cache_resource
+def email_configured():
+    """Return whether the email settings are present in the Streamlit secrets, checked once per process."""
+    try:
+        return EMAIL_SETTINGS <= (st.secrets.get("email") or {}).keys()
+    except Exception as e:
+        # st.secrets raises when no secrets file exists at all
+        logging.error(f"Error checking email configuration: {str(e)}")
+        return False